@@ -1,17 +1,23 @@
-from flask import Flask, jsonify, request, Response
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_socketio import SocketIO
 from flask_jwt_extended import JWTManager, verify_jwt_in_request
 from flask_jwt_extended.exceptions import JWTDecodeError, NoAuthorizationError
 from config import Config
 from extensions import db
+from migrations import apply_migrations
 from routes import register_routes
+from tasks.health_probe import start_health_probe
+from tasks.message_writer import start_message_writer
+from tasks.reminder_dispatcher import start_reminder_dispatcher
+from utils.circuit_breaker import CircuitOpenError
+from utils.frontend_proxy import CACHEABLE_ASSET_PREFIX, forward_cached_asset, forward_request
 from utils.logging import log_info, log_error, log_warn
+from utils.static_frontend import serve_frontend_file
 import eventlet
 import os
 import sys
 import requests
-from urllib.parse import urljoin
 
 eventlet.monkey_patch()
 
@@ -22,7 +28,13 @@ app.config.from_object(Config)
 CORS(app, resources={r"/*": {"origins": "*"}})
 db.init_app(app)
 jwt = JWTManager(app)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
+# メッセージキューを設定すると、他のワーカー・ノードに接続しているクライアントにも配信される
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    async_mode='eventlet',
+    message_queue=app.config['SOCKETIO_MESSAGE_QUEUE']
+)
 
 # Register routes
 register_routes(app, socketio)
@@ -30,101 +42,61 @@ register_routes(app, socketio)
 # Next.jsフロントエンドサーバーのURL
 FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
 
+# 静的エクスポートした Next.js のディレクトリ（設定した場合はプロキシせずにディスクから直接配信）
+FRONTEND_DIR = os.environ.get('FRONTEND_DIR')
+
+def _frontend_unavailable_response(path, frontend_status, error_message, status_code=503, headers=None):
+    """フロントエンドに転送できない場合のレスポンス（ルートパスではAPI情報を返す）"""
+    if path == '/' or path == '':
+        return jsonify({
+            'service': 'poke-sup-backend',
+            'version': '1.0.0',
+            'status': 'running',
+            'frontend': frontend_status,
+            'frontend_url': FRONTEND_URL,
+            'error': error_message,
+            'endpoints': {
+                'health': '/api/health',
+                'auth': '/api/auth',
+                'conversations': '/api/conversations',
+                'messages': '/api/messages',
+                'health_data': '/api/health-data',
+                'reminders': '/api/reminders',
+                'users': '/api/users',
+                'health_goals': '/api/health-goals'
+            },
+            'documentation': 'See API_DOCUMENTATION.md for details'
+        }), 200
+    error = 'Frontend timeout' if frontend_status == 'timeout' else 'Frontend not available'
+    return jsonify({'error': error, 'frontend_url': FRONTEND_URL}), status_code, headers or {}
+
 def proxy_to_frontend(path):
-    """Next.jsフロントエンドサーバーにリクエストをプロキシ"""
+    """Next.jsフロントエンドサーバーにリクエストをプロキシ（本文はストリーミングで中継）"""
     try:
-        frontend_url = urljoin(FRONTEND_URL, path)
-        # クエリパラメータも含める
-        if request.query_string:
-            frontend_url += '?' + request.query_string.decode('utf-8')
-        
-        # リクエストを転送（タイムアウトを延長）
-        resp = requests.request(
-            method=request.method,
-            url=frontend_url,
-            headers={key: value for (key, value) in request.headers if key != 'Host'},
-            data=request.get_data(),
-            cookies=request.cookies,
-            allow_redirects=False,
-            timeout=30  # タイムアウトを30秒に延長
+        if path.startswith(CACHEABLE_ASSET_PREFIX):
+            # ハッシュ付きの静的アセットはメモリキャッシュから返す
+            return forward_cached_asset(FRONTEND_URL, path)
+        return forward_request(FRONTEND_URL, path)
+    except CircuitOpenError as e:
+        # 接続失敗が続いているため、タイムアウトを待たずにすぐ返す
+        return _frontend_unavailable_response(
+            path, 'not available', 'Frontend server is not responding. Please check the logs.',
+            headers={'Retry-After': str(int(e.retry_after))}
         )
-        
-        # レスポンスを返す
-        excluded_headers = ['content-encoding', 'content-length', 'transfer-encoding', 'connection']
-        headers = [(name, value) for (name, value) in resp.raw.headers.items()
-                   if name.lower() not in excluded_headers]
-        
-        return Response(resp.content, resp.status_code, headers)
     except requests.exceptions.ConnectionError as e:
         log_error("Failed to connect to frontend", error=e, path=path, frontend_url=FRONTEND_URL)
         # フロントエンドが起動していない場合は、API情報を返す
-        if path == '/' or path == '':
-            return jsonify({
-                'service': 'poke-sup-backend',
-                'version': '1.0.0',
-                'status': 'running',
-                'frontend': 'not available',
-                'frontend_url': FRONTEND_URL,
-                'error': 'Frontend server is not responding. Please check the logs.',
-                'endpoints': {
-                    'health': '/api/health',
-                    'auth': '/api/auth',
-                    'conversations': '/api/conversations',
-                    'messages': '/api/messages',
-                    'health_data': '/api/health-data',
-                    'reminders': '/api/reminders',
-                    'users': '/api/users',
-                    'health_goals': '/api/health-goals'
-                },
-                'documentation': 'See API_DOCUMENTATION.md for details'
-            }), 200
-        return jsonify({'error': 'Frontend not available', 'frontend_url': FRONTEND_URL}), 503
+        return _frontend_unavailable_response(
+            path, 'not available', 'Frontend server is not responding. Please check the logs.'
+        )
     except requests.exceptions.Timeout as e:
         log_error("Frontend request timeout", error=e, path=path, frontend_url=FRONTEND_URL)
-        if path == '/' or path == '':
-            return jsonify({
-                'service': 'poke-sup-backend',
-                'version': '1.0.0',
-                'status': 'running',
-                'frontend': 'timeout',
-                'frontend_url': FRONTEND_URL,
-                'error': 'Frontend server is not responding within timeout period.',
-                'endpoints': {
-                    'health': '/api/health',
-                    'auth': '/api/auth',
-                    'conversations': '/api/conversations',
-                    'messages': '/api/messages',
-                    'health_data': '/api/health-data',
-                    'reminders': '/api/reminders',
-                    'users': '/api/users',
-                    'health_goals': '/api/health-goals'
-                },
-                'documentation': 'See API_DOCUMENTATION.md for details'
-            }), 200
-        return jsonify({'error': 'Frontend timeout', 'frontend_url': FRONTEND_URL}), 503
+        return _frontend_unavailable_response(
+            path, 'timeout', 'Frontend server is not responding within timeout period.'
+        )
     except requests.exceptions.RequestException as e:
         log_error("Failed to proxy to frontend", error=e, path=path, frontend_url=FRONTEND_URL)
-        if path == '/' or path == '':
-            return jsonify({
-                'service': 'poke-sup-backend',
-                'version': '1.0.0',
-                'status': 'running',
-                'frontend': 'not available',
-                'frontend_url': FRONTEND_URL,
-                'error': str(e),
-                'endpoints': {
-                    'health': '/api/health',
-                    'auth': '/api/auth',
-                    'conversations': '/api/conversations',
-                    'messages': '/api/messages',
-                    'health_data': '/api/health-data',
-                    'reminders': '/api/reminders',
-                    'users': '/api/users',
-                    'health_goals': '/api/health-goals'
-                },
-                'documentation': 'See API_DOCUMENTATION.md for details'
-            }), 200
-        return jsonify({'error': 'Frontend not available', 'frontend_url': FRONTEND_URL}), 503
+        return _frontend_unavailable_response(path, 'not available', str(e))
 
 # ルートパスとAPI以外のパスをフロントエンドにプロキシ
 # 注意: このルートは最後に定義する必要があります（APIルートの後に）
@@ -138,6 +110,13 @@ def catch_all(path):
         log_warn("API endpoint not found", path=request.path)
         return jsonify({'error': 'API endpoint not found'}), 404
     
+    if FRONTEND_DIR:
+        response = serve_frontend_file(FRONTEND_DIR, path)
+        if response is None:
+            log_warn("Frontend file not found", path=path, frontend_dir=FRONTEND_DIR)
+            return jsonify({'error': 'Not found'}), 404
+        return response
+    
     # フロントエンドにプロキシ
     return proxy_to_frontend(path)
 
@@ -226,6 +205,7 @@ def startup_log():
         "Application starting",
         port=port,
         environment=env,
+        frontend_mode='static' if FRONTEND_DIR else 'proxy',
         database_configured=bool(database_url and database_url != DATABASE_URL_NOT_SET)
     )
 
@@ -265,6 +245,9 @@ if __name__ == '__main__':
                 db.create_all()
                 database_connected = True
                 log_info("Database tables created/verified", status="success")
+                
+                # 既存データベースに未適用のスキーマ変更（インデックスなど）を適用
+                apply_migrations()
             except Exception as e:
                 database_url = os.environ.get('DATABASE_URL', DATABASE_URL_NOT_SET)
                 error_type_name = type(e).__name__
@@ -385,6 +368,17 @@ if __name__ == '__main__':
         else:
             log_warn("Starting server without database", host='0.0.0.0', port=port, debug=debug, database="disconnected")
         
+        # リロード監視用の親プロセスでは起動しない
+        is_serving_process = not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+        if database_connected and app.config['REMINDER_DISPATCHER_ENABLED'] and is_serving_process:
+            start_reminder_dispatcher(app, socketio)
+        if database_connected and app.config['MESSAGE_WRITE_BEHIND_ENABLED'] and is_serving_process:
+            start_message_writer(app, socketio)
+        
+        # データベースに接続できていない場合も状態を報告するため、プローブは常に起動する
+        if is_serving_process:
+            start_health_probe(app, socketio)
+        
         socketio.run(app, host='0.0.0.0', port=port, debug=debug)
     except Exception as e:
         log_error("Failed to start application", error=e, error_type=type(e).__name__)
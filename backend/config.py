@@ -48,8 +48,35 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
+    
+    # パスワードハッシュのアルゴリズム（scrypt, pbkdf2）とコスト（scrypt は N、pbkdf2 は反復回数）
+    # 変更すると、古い設定のハッシュは次回ログイン時に再ハッシュされる
+    PASSWORD_HASH_ALGORITHM = os.getenv('PASSWORD_HASH_ALGORITHM', 'scrypt')
+    PASSWORD_HASH_COST = int(os.getenv('PASSWORD_HASH_COST', 0)) or None
+    # パスワードハッシュを同時に計算するネイティブスレッド数の上限
+    PASSWORD_HASH_CONCURRENCY = int(os.getenv('PASSWORD_HASH_CONCURRENCY', 4))
     CORS_ORIGINS = "*"
     
     # Railway用の設定
     PORT = int(os.getenv('PORT', 5000))
+    
+    # 期限になったリマインダーを Socket.IO で通知するバックグラウンドタスク
+    REMINDER_DISPATCHER_ENABLED = os.getenv('REMINDER_DISPATCHER_ENABLED', 'true').lower() in ('true', '1', 'yes')
+    
+    # 複数のワーカー・ノード間で Socket.IO のイベントを中継するメッセージキュー（例: redis://localhost:6379/0）
+    # 未設定の場合は1プロセス内だけで配信する
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE') or None
+    # セッション・在席情報の共有レジストリ（redis:// の場合は Redis、未設定ならプロセス内）
+    PRESENCE_REGISTRY_URL = os.getenv('PRESENCE_REGISTRY_URL') or (
+        SOCKETIO_MESSAGE_QUEUE if SOCKETIO_MESSAGE_QUEUE and SOCKETIO_MESSAGE_QUEUE.startswith(('redis://', 'rediss://')) else None
+    )
+    
+    # ソケット経由のメッセージを即時配信し、数ミリ秒または一定件数ごとにまとめて保存する（write-behind）
+    MESSAGE_WRITE_BEHIND_ENABLED = os.getenv('MESSAGE_WRITE_BEHIND_ENABLED', 'false').lower() in ('true', '1', 'yes')
+    # グループコミットの時間枠（ミリ秒）と1回にまとめる最大件数
+    MESSAGE_GROUP_COMMIT_WINDOW_MS = float(os.getenv('MESSAGE_GROUP_COMMIT_WINDOW_MS', 5))
+    MESSAGE_GROUP_COMMIT_MAX_BATCH = int(os.getenv('MESSAGE_GROUP_COMMIT_MAX_BATCH', 100))
+    
+    # /api/health が返す状態をバックグラウンドで更新する間隔（秒）
+    HEALTH_PROBE_INTERVAL = float(os.getenv('HEALTH_PROBE_INTERVAL', 15))
 
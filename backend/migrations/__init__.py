@@ -0,0 +1,65 @@
+"""
+バージョン管理されたスキーママイグレーション
+db.create_all() は既存テーブルにインデックスやカラムを追加しないため、
+既存データベースへのスキーマ変更は番号付きのマイグレーションとしてここに追加する
+"""
+from datetime import datetime
+from typing import List
+from sqlalchemy import Column, DateTime, MetaData, String, Table, select
+from extensions import db
+from utils.logging import log_info
+from . import v0001_hot_path_indexes, v0002_latest_health_values, v0003_message_client_ids
+
+# 適用順に並べる
+MIGRATIONS = [
+    v0001_hot_path_indexes,
+    v0002_latest_health_values,
+    v0003_message_client_ids,
+]
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations',
+    _metadata,
+    Column('version', String(50), primary_key=True),
+    Column('description', String(200)),
+    Column('applied_at', DateTime, nullable=False, default=datetime.utcnow)
+)
+
+def get_applied_versions(engine=None) -> List[str]:
+    """適用済みのマイグレーションバージョンを返す"""
+    engine = engine or db.engine
+    with engine.begin() as connection:
+        schema_migrations.create(connection, checkfirst=True)
+        return [row.version for row in connection.execute(select(schema_migrations.c.version))]
+
+def apply_migrations(engine=None) -> List[str]:
+    """
+    未適用のマイグレーションを順に適用
+
+    各マイグレーションは個別のトランザクションで実行し、成功したものだけを記録する
+
+    Returns:
+        今回適用したバージョンのリスト
+    """
+    engine = engine or db.engine
+    applied = set(get_applied_versions(engine))
+    newly_applied = []
+
+    for migration in MIGRATIONS:
+        if migration.VERSION in applied:
+            continue
+
+        with engine.begin() as connection:
+            migration.upgrade(connection)
+            connection.execute(schema_migrations.insert().values(
+                version=migration.VERSION,
+                description=migration.DESCRIPTION,
+                applied_at=datetime.utcnow()
+            ))
+
+        newly_applied.append(migration.VERSION)
+        log_info("Migration applied", version=migration.VERSION, description=migration.DESCRIPTION)
+
+    return newly_applied
@@ -0,0 +1,25 @@
+"""
+頻出クエリ向けの複合インデックスを追加
+"""
+from sqlalchemy import text
+
+VERSION = '0001'
+DESCRIPTION = 'Add composite indexes for hot query paths'
+
+# (インデックス名, テーブル, カラム)
+INDEXES = [
+    # メッセージ履歴のキーセットページング
+    ('ix_messages_conversation_id_created_at', 'messages', ['conversation_id', 'created_at', 'id']),
+    # 種類・期間での健康データ検索と最新値の取得
+    ('ix_health_data_user_id_data_type_recorded_at', 'health_data', ['user_id', 'data_type', 'recorded_at']),
+    # ユーザーごとのリマインダー一覧（予定日時順）
+    ('ix_reminders_user_id_scheduled_at', 'reminders', ['user_id', 'scheduled_at']),
+    ('ix_health_goals_user_id', 'health_goals', ['user_id']),
+    # patient_id OR provider_id での会話検索（PostgreSQLでは BitmapOr で両方を使う）
+    ('ix_conversations_patient_id', 'conversations', ['patient_id']),
+    ('ix_conversations_provider_id', 'conversations', ['provider_id']),
+]
+
+def upgrade(connection):
+    for name, table, columns in INDEXES:
+        connection.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({", ".join(columns)})'))
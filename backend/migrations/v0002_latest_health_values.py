@@ -0,0 +1,36 @@
+"""
+最新値テーブル latest_health_values を作成し、既存の健康データから値を埋める
+"""
+from sqlalchemy import text
+
+VERSION = '0002'
+DESCRIPTION = 'Create and backfill latest_health_values'
+
+def upgrade(connection):
+    connection.execute(text('''
+        CREATE TABLE IF NOT EXISTS latest_health_values (
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            data_type VARCHAR(50) NOT NULL,
+            health_data_id INTEGER NOT NULL,
+            value FLOAT NOT NULL,
+            unit VARCHAR(20),
+            recorded_at TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (user_id, data_type)
+        )
+    '''))
+    connection.execute(text('DELETE FROM latest_health_values'))
+    connection.execute(text('''
+        INSERT INTO latest_health_values (user_id, data_type, health_data_id, value, unit, recorded_at, updated_at)
+        SELECT user_id, data_type, id, value, unit, recorded_at, CURRENT_TIMESTAMP
+        FROM (
+            SELECT id, user_id, data_type, value, unit, recorded_at,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY user_id, data_type
+                       ORDER BY recorded_at DESC, id DESC
+                   ) AS row_number
+            FROM health_data
+            WHERE recorded_at IS NOT NULL
+        ) ranked
+        WHERE row_number = 1
+    '''))
@@ -0,0 +1,18 @@
+"""
+ソケット経由のメッセージを再送しても重複して保存しないよう、
+送信者が付けるID（client_message_id）のカラムとユニークインデックスを追加
+"""
+from sqlalchemy import inspect, text
+
+VERSION = '0003'
+DESCRIPTION = 'Add messages.client_message_id for idempotent resends'
+
+def upgrade(connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('messages')}
+    if 'client_message_id' not in columns:
+        connection.execute(text('ALTER TABLE messages ADD COLUMN client_message_id VARCHAR(64)'))
+    # NULL 同士は重複とみなされないため、ID を付けないメッセージには影響しない
+    connection.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_messages_user_id_client_message_id '
+        'ON messages (user_id, client_message_id)'
+    ))
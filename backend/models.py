@@ -1,6 +1,6 @@
 from extensions import db
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hash_password, needs_rehash, verify_password
 import enum
 
 class UserRole(enum.Enum):
@@ -26,10 +26,14 @@ class User(db.Model):
     reminders = db.relationship('Reminder', backref='user', lazy=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """ハッシュのアルゴリズム・コストが現在の設定より古いか"""
+        return needs_rehash(self.password_hash)
     
     def to_dict(self):
         return {
@@ -40,9 +44,21 @@ class User(db.Model):
             'language': self.language,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+    
+    def to_summary_dict(self):
+        """メッセージ一覧などに埋め込む簡易表現"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'role': self.role.value
+        }
 
 class Conversation(db.Model):
     __tablename__ = 'conversations'
+    __table_args__ = (
+        db.Index('ix_conversations_patient_id', 'patient_id'),
+        db.Index('ix_conversations_provider_id', 'provider_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -54,6 +70,7 @@ class Conversation(db.Model):
     patient = db.relationship('User', foreign_keys=[patient_id], backref='patient_conversations')
     provider = db.relationship('User', foreign_keys=[provider_id], backref='provider_conversations')
     messages = db.relationship('Message', backref='conversation', lazy=True, cascade='all, delete-orphan')
+    read_states = db.relationship('ConversationReadState', backref='conversation', lazy=True, cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -68,27 +85,70 @@ class Conversation(db.Model):
 
 class Message(db.Model):
     __tablename__ = 'messages'
+    __table_args__ = (
+        db.Index('ix_messages_conversation_id_created_at', 'conversation_id', 'created_at', 'id'),
+        db.Index('uq_messages_user_id_client_message_id', 'user_id', 'client_message_id', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
+    # 送信者が付けるID（ソケット経由の再送で重複して保存しないため）
+    client_message_id = db.Column(db.String(64))
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
+        return self._to_dict(self.user.to_dict() if self.user else None)
+    
+    def _to_dict(self, user):
         return {
             'id': self.id,
             'conversation_id': self.conversation_id,
             'user_id': self.user_id,
-            'user': self.user.to_dict() if self.user else None,
+            'user': user,
             'content': self.content,
             'is_read': self.is_read,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+    
+    @classmethod
+    def to_dict_list(cls, messages):
+        """メッセージ一覧をシリアライズ（投稿者は1回のクエリでまとめて取得し、簡易表現で埋め込む）"""
+        user_ids = {message.user_id for message in messages}
+        authors = {}
+        if user_ids:
+            authors = {
+                user.id: user.to_summary_dict()
+                for user in User.query.filter(User.id.in_(user_ids)).all()
+            }
+        return [message._to_dict(authors.get(message.user_id)) for message in messages]
+
+class ConversationReadState(db.Model):
+    """会話ごと・参加者ごとの既読位置と未読件数"""
+    __tablename__ = 'conversation_read_states'
+    
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    last_read_message_id = db.Column(db.Integer)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'conversation_id': self.conversation_id,
+            'user_id': self.user_id,
+            'last_read_message_id': self.last_read_message_id,
+            'unread_count': self.unread_count,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
 
 class HealthData(db.Model):
     __tablename__ = 'health_data'
+    __table_args__ = (
+        db.Index('ix_health_data_user_id_data_type_recorded_at', 'user_id', 'data_type', 'recorded_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -111,8 +171,34 @@ class HealthData(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class LatestHealthValue(db.Model):
+    """ユーザー・データタイプごとの最新の健康データ（健康データの書き込みと同じトランザクションで更新）"""
+    __tablename__ = 'latest_health_values'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    data_type = db.Column(db.String(50), primary_key=True)
+    health_data_id = db.Column(db.Integer, nullable=False)
+    value = db.Column(db.Float, nullable=False)
+    unit = db.Column(db.String(20))
+    recorded_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'data_type': self.data_type,
+            'health_data_id': self.health_data_id,
+            'value': self.value,
+            'unit': self.unit,
+            'recorded_at': self.recorded_at.isoformat() if self.recorded_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class Reminder(db.Model):
     __tablename__ = 'reminders'
+    __table_args__ = (
+        db.Index('ix_reminders_user_id_scheduled_at', 'user_id', 'scheduled_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -143,6 +229,9 @@ class Reminder(db.Model):
 
 class HealthGoal(db.Model):
     __tablename__ = 'health_goals'
+    __table_args__ = (
+        db.Index('ix_health_goals_user_id', 'user_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
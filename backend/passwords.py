@@ -0,0 +1,73 @@
+"""
+パスワードのハッシュ化と検証
+
+ハッシュ計算は CPU を長時間占有するため、eventlet 環境ではネイティブスレッドプール（eventlet.tpool）で実行し、
+ハブ（WebSocket や他の HTTP リクエスト）を止めないようにする。
+アルゴリズムとコストは設定で変更でき、古い設定のハッシュはログイン時に再ハッシュする。
+"""
+import threading
+from typing import Callable, Optional
+from flask import current_app, has_app_context
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+PASSWORD_HASH_ALGORITHMS = ('scrypt', 'pbkdf2')
+
+# アルゴリズムごとのデフォルトのコスト（scrypt は N、pbkdf2 は反復回数）
+DEFAULT_COSTS = {
+    'scrypt': 32768,
+    'pbkdf2': DEFAULT_PBKDF2_ITERATIONS,
+}
+
+DEFAULT_CONCURRENCY = 4
+
+_semaphore: Optional[threading.BoundedSemaphore] = None
+_semaphore_lock = threading.Lock()
+
+def _config(key: str, default=None):
+    if has_app_context():
+        return current_app.config.get(key, default)
+    return default
+
+def get_hash_method() -> str:
+    """設定からwerkzeug の method 文字列（例: scrypt:32768:8:1）を組み立てる"""
+    algorithm = _config('PASSWORD_HASH_ALGORITHM', 'scrypt')
+    if algorithm not in PASSWORD_HASH_ALGORITHMS:
+        raise ValueError(f"PASSWORD_HASH_ALGORITHM must be one of: {', '.join(PASSWORD_HASH_ALGORITHMS)}")
+    cost = _config('PASSWORD_HASH_COST') or DEFAULT_COSTS[algorithm]
+    if algorithm == 'scrypt':
+        return f'scrypt:{cost}:8:1'
+    return f'pbkdf2:sha256:{cost}'
+
+def _get_semaphore() -> threading.BoundedSemaphore:
+    global _semaphore
+    if _semaphore is None:
+        with _semaphore_lock:
+            if _semaphore is None:
+                _semaphore = threading.BoundedSemaphore(_config('PASSWORD_HASH_CONCURRENCY', DEFAULT_CONCURRENCY))
+    return _semaphore
+
+def _run_blocking(func: Callable, *args):
+    """
+    ハッシュ計算を実行
+
+    eventlet で monkey patch されている場合は tpool のネイティブスレッドで実行する。
+    同時実行数はセマフォで制限し、ログインが集中しても tpool を使い切らないようにする
+    """
+    with _get_semaphore():
+        try:
+            from eventlet import patcher, tpool
+        except ImportError:
+            return func(*args)
+        if not patcher.is_monkey_patched('thread'):
+            return func(*args)
+        return tpool.execute(func, *args)
+
+def hash_password(password: str) -> str:
+    return _run_blocking(generate_password_hash, password, get_hash_method())
+
+def verify_password(password_hash: str, password: str) -> bool:
+    return _run_blocking(check_password_hash, password_hash, password)
+
+def needs_rehash(password_hash: str) -> bool:
+    """保存済みハッシュのアルゴリズム・コストが現在の設定と異なるか"""
+    return password_hash.split('$', 1)[0] != get_hash_method()
@@ -7,6 +7,8 @@ from .reminders import reminders_bp
 from .users import users_bp
 from .health import health_bp
 from .health_goals import health_goals_bp
+from .calendar import calendar_bp
+from .dashboard import dashboard_bp
 
 def register_routes(app, socketio: SocketIO):
     app.register_blueprint(health_bp, url_prefix='/api/health')
@@ -17,6 +19,8 @@ def register_routes(app, socketio: SocketIO):
     app.register_blueprint(reminders_bp, url_prefix='/api/reminders')
     app.register_blueprint(users_bp, url_prefix='/api/users')
     app.register_blueprint(health_goals_bp, url_prefix='/api/health-goals')
+    app.register_blueprint(calendar_bp, url_prefix='/api/calendar')
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
     
     # Register socketio handlers
     from .socketio_handlers import register_socketio_handlers
@@ -4,7 +4,7 @@ from extensions import db
 from models import User, UserRole
 from datetime import datetime
 from utils.logging import log_info, log_error, log_warn
-from utils import get_default_user_id
+from utils import get_current_user, get_default_user_id, invalidate_user
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -54,7 +54,7 @@ def register():
         db.session.add(user)
         db.session.commit()
         
-        access_token = create_access_token(identity=user.id)
+        access_token = create_access_token(identity=str(user.id))
         
         log_info("User registered successfully", userId=user.id, email=email, role=user.role.value)
         
@@ -96,7 +96,13 @@ def login():
             log_warn("Login failed - invalid password", email=email)
             return jsonify({'error': 'Invalid credentials'}), 401
         
-        access_token = create_access_token(identity=user.id)
+        if user.password_needs_rehash():
+            # ハッシュの設定が変わっている場合は、平文パスワードがある今のうちに再ハッシュする
+            user.set_password(password)
+            db.session.commit()
+            log_info("Password rehashed", userId=user.id)
+        
+        access_token = create_access_token(identity=str(user.id))
         
         log_info("User logged in successfully", userId=user.id, email=email, role=user.role.value)
         
@@ -111,20 +117,19 @@ def login():
         return jsonify({'error': error_message}), 500
 
 @auth_bp.route('/me', methods=['GET'])
-def get_current_user():
-    user_id = get_default_user_id()
-    user = User.query.get(user_id)
+def get_me():
+    user = get_current_user()
     
     if not user:
-        log_warn("Get current user failed - user not found", userId=user_id)
+        log_warn("Get current user failed - user not found", userId=get_default_user_id())
         return jsonify({'error': 'User not found'}), 404
     
-    return jsonify(user.to_dict()), 200
+    return jsonify(user), 200
 
 @auth_bp.route('/update-profile', methods=['PUT'])
 def update_profile():
     user_id = get_default_user_id()
-    user = User.query.get(user_id)
+    user = db.session.get(User, user_id)
     
     if not user:
         log_warn("Update profile failed - user not found", userId=user_id)
@@ -140,6 +145,7 @@ def update_profile():
         
         user.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_user(user_id)
         
         log_info("Profile updated", userId=user_id, updated_fields=list(data.keys()) if data else [])
         
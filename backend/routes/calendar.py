@@ -0,0 +1,111 @@
+from flask import Blueprint, request, jsonify
+from extensions import db
+from models import HealthData
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, select
+from utils import get_default_user_id
+from utils.health_metrics import bucket_expression
+from utils.recurrence import get_occurrences
+from utils.logging import log_error
+
+calendar_bp = Blueprint('calendar', __name__)
+
+# UTC からのずれとして受け付ける範囲（分）
+MIN_TZ_OFFSET = -12 * 60
+MAX_TZ_OFFSET = 14 * 60
+
+def _month_window(year, month):
+    """月初〜翌月初の日付と、その現地時刻（naive datetime）を返す"""
+    first_day = date(year, month, 1)
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    return (
+        first_day,
+        next_month,
+        datetime.combine(first_day, datetime.min.time()),
+        datetime.combine(next_month, datetime.min.time())
+    )
+
+def _summarize_health_data(user_id, window_start, window_end, tz_offset):
+    """日 × データタイプごとの件数・最小・最大・平均を1回の集計クエリで取得"""
+    day_start = bucket_expression('day', tz_offset)
+    rows = db.session.execute(
+        select(
+            day_start.label('day_start'),
+            HealthData.data_type,
+            func.count().label('count'),
+            func.min(HealthData.value).label('min'),
+            func.max(HealthData.value).label('max'),
+            func.avg(HealthData.value).label('avg')
+        ).where(
+            HealthData.user_id == user_id,
+            HealthData.recorded_at >= window_start,
+            HealthData.recorded_at < window_end
+        ).group_by(day_start, HealthData.data_type).order_by(day_start, HealthData.data_type)
+    ).all()
+
+    summaries = {}
+    for row in rows:
+        day_value = row.day_start
+        if isinstance(day_value, str):
+            day_value = datetime.fromisoformat(day_value)
+        summaries.setdefault(day_value.date().isoformat(), []).append({
+            'data_type': row.data_type,
+            'count': row.count,
+            'min': row.min,
+            'max': row.max,
+            'avg': float(row.avg) if row.avg is not None else None
+        })
+    return summaries
+
+@calendar_bp.route('/month', methods=['GET'])
+def get_calendar_month():
+    """月表示のカレンダー用に、日ごとのリマインダー発生予定と健康データの集計を返す"""
+    user_id = get_default_user_id()
+
+    try:
+        year = int(request.args['year'])
+        month = int(request.args['month'])
+        tz_offset = int(request.args.get('tz_offset', 0))
+    except KeyError:
+        return jsonify({'error': 'year and month are required'}), 400
+    except ValueError:
+        return jsonify({'error': 'year, month and tz_offset must be integers'}), 400
+
+    if not 1 <= month <= 12 or not 1 <= year <= 9998:
+        return jsonify({'error': 'Invalid year or month'}), 400
+
+    if not MIN_TZ_OFFSET <= tz_offset <= MAX_TZ_OFFSET:
+        return jsonify({'error': f'tz_offset must be between {MIN_TZ_OFFSET} and {MAX_TZ_OFFSET}'}), 400
+
+    first_day, next_month, local_start, local_end = _month_window(year, month)
+    offset = timedelta(minutes=tz_offset)
+
+    try:
+        # リマインダーの日時はフォームの datetime-local の値（現地時刻）のまま保存されているため、時差でずらさない
+        occurrences = get_occurrences(user_id, local_start, local_end)
+        # 健康データの recorded_at は UTC のため、現地時刻の月の範囲を UTC に直して集計する
+        health_summaries = _summarize_health_data(user_id, local_start - offset, local_end - offset, tz_offset)
+    except Exception as e:
+        log_error("Get calendar month failed", error=e, userId=user_id, year=year, month=month)
+        return jsonify({'error': 'Failed to retrieve calendar'}), 500
+
+    reminders_by_day = {}
+    for occurrence in occurrences:
+        local_day = datetime.fromisoformat(occurrence['occurs_at']).date()
+        reminders_by_day.setdefault(local_day.isoformat(), []).append(occurrence)
+
+    days = []
+    for day_index in range((next_month - first_day).days):
+        day_key = (first_day + timedelta(days=day_index)).isoformat()
+        days.append({
+            'date': day_key,
+            'reminders': reminders_by_day.get(day_key, []),
+            'health_data': health_summaries.get(day_key, [])
+        })
+
+    return jsonify({
+        'year': year,
+        'month': month,
+        'tz_offset': tz_offset,
+        'days': days
+    }), 200
@@ -1,38 +1,50 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
 from models import Conversation, User, UserRole
+from sqlalchemy.orm import joinedload
 from utils.logging import log_info, log_error, log_warn
-from utils import get_default_user_id
+from utils import get_current_user, get_default_user_id
+from utils.membership import invalidate_membership, remember_conversations
+from utils.read_state import get_unread_counts
 
 conversations_bp = Blueprint('conversations', __name__)
 
+# 会話一覧の最大ページサイズ
+MAX_PAGE_SIZE = 200
+
 @conversations_bp.route('', methods=['GET'])
 def get_conversations():
     user_id = get_default_user_id()
-    user = User.query.get(user_id)
     
-    if not user:
+    if not get_current_user():
         log_warn("Get conversations failed - user not found", userId=user_id)
         return jsonify({'error': 'User not found'}), 404
     
     try:
+        limit = request.args.get('limit', type=int)
+        offset = request.args.get('offset', 0, type=int)
+        
         # Get conversations where user is either patient or provider
-        conversations = Conversation.query.filter(
+        # 参加者は JOIN で同時に取得する（会話ごとの遅延ロードを避ける）
+        query = Conversation.query.options(
+            joinedload(Conversation.patient),
+            joinedload(Conversation.provider)
+        ).filter(
             (Conversation.patient_id == user_id) | (Conversation.provider_id == user_id)
-        ).all()
+        ).order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+        
+        if limit:
+            query = query.offset(max(offset, 0)).limit(max(1, min(limit, MAX_PAGE_SIZE)))
+        
+        conversations = query.all()
+        
+        # 未読件数は既読状態テーブルからまとめて取得
+        unread_counts = get_unread_counts([conv.id for conv in conversations], user_id)
         
-        # Add unread count to each conversation
-        from models import Message
         result = []
         for conv in conversations:
             conv_dict = conv.to_dict()
-            # Count unread messages (messages not from current user and not read)
-            unread_count = Message.query.filter(
-                Message.conversation_id == conv.id,
-                Message.user_id != user_id,
-                Message.is_read == False
-            ).count()
-            conv_dict['unread_count'] = unread_count
+            conv_dict['unread_count'] = unread_counts.get(conv.id, 0)
             result.append(conv_dict)
         
         log_info("Conversations retrieved", userId=user_id, count=len(result))
@@ -90,6 +102,10 @@ def create_conversation():
         db.session.add(conversation)
         db.session.commit()
         
+        # 同じIDの会話についてキャッシュに残っている結果（削除・再作成されたデータベースなど）を捨て、参加者を登録する
+        invalidate_membership(conversation.id)
+        remember_conversations([conversation])
+        
         log_info("Conversation created", conversationId=conversation.id, patient_id=patient_id, provider_id=provider_id, created_by=user_id)
         
         return jsonify(conversation.to_dict()), 201
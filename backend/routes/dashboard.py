@@ -0,0 +1,103 @@
+from flask import Blueprint, request, jsonify
+from extensions import db
+from models import Conversation, HealthData, HealthGoal, LatestHealthValue, Reminder
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from utils import get_default_user_id
+from utils.cache import TTLCache
+from utils.health_metrics import get_goal_progress
+from utils.read_state import get_unread_counts
+from utils.recurrence import expand_occurrences, find_reminders_in_window
+from utils.logging import log_error
+from routes.calendar import MIN_TZ_OFFSET, MAX_TZ_OFFSET
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+# 今後の予定として返す件数
+DEFAULT_UPCOMING_LIMIT = 5
+MAX_UPCOMING_LIMIT = 50
+
+# 今後の予定を探す期間
+UPCOMING_WINDOW = timedelta(days=30)
+
+# サマリーは短時間だけユーザーごとにキャッシュする
+SUMMARY_CACHE_TTL = 15
+_summary_cache = TTLCache(maxsize=1024, ttl=SUMMARY_CACHE_TTL)
+
+def _build_summary(user_id, upcoming_limit, tz_offset):
+    now = datetime.utcnow()
+    # scheduled_at は利用者の現地時刻で保存されているため、今後の予定は現地時刻で探す
+    local_now = now + timedelta(minutes=tz_offset)
+
+    conversation_ids = [row.id for row in db.session.query(Conversation.id).filter(
+        (Conversation.patient_id == user_id) | (Conversation.provider_id == user_id)
+    )]
+    unread_counts = get_unread_counts(conversation_ids, user_id)
+
+    latest_values = LatestHealthValue.query.filter_by(user_id=user_id).order_by(LatestHealthValue.data_type).all()
+    health_data_count = db.session.query(func.count(HealthData.id)).filter(
+        HealthData.user_id == user_id
+    ).scalar()
+
+    pending_reminder_count = db.session.query(func.count(Reminder.id)).filter(
+        Reminder.user_id == user_id,
+        Reminder.is_completed == False
+    ).scalar()
+    upcoming_count = db.session.query(func.count(Reminder.id)).filter(
+        Reminder.user_id == user_id,
+        Reminder.is_completed == False,
+        Reminder.scheduled_at >= local_now
+    ).scalar()
+    upcoming = expand_occurrences(
+        find_reminders_in_window(user_id, local_now, local_now + UPCOMING_WINDOW, include_completed=False),
+        local_now,
+        local_now + UPCOMING_WINDOW,
+        limit=upcoming_limit
+    )
+
+    # 目標の進捗は取得済みの最新値から計算する（追加のクエリは目標の取得のみ）
+    values_by_type = {latest.data_type: latest.value for latest in latest_values}
+    goals = HealthGoal.query.filter_by(user_id=user_id).all()
+
+    return {
+        'conversations': {
+            'count': len(conversation_ids),
+            'unread_count': sum(unread_counts.values())
+        },
+        'health_data': {
+            'count': health_data_count,
+            'latest': [latest.to_dict() for latest in latest_values]
+        },
+        'reminders': {
+            'pending_count': pending_reminder_count,
+            'upcoming_count': upcoming_count,
+            'upcoming': upcoming
+        },
+        'goals': [get_goal_progress(goal, values_by_type) for goal in goals],
+        'generated_at': now.isoformat()
+    }
+
+@dashboard_bp.route('/summary', methods=['GET'])
+def get_dashboard_summary():
+    """ダッシュボード表示用に、未読件数・最新の健康データ・今後の予定・目標の進捗をまとめて返す"""
+    user_id = get_default_user_id()
+    upcoming_limit = max(1, min(request.args.get('upcoming_limit', DEFAULT_UPCOMING_LIMIT, type=int),
+                                MAX_UPCOMING_LIMIT))
+    try:
+        tz_offset = int(request.args.get('tz_offset', 0))
+    except ValueError:
+        return jsonify({'error': 'tz_offset must be an integer'}), 400
+    if not MIN_TZ_OFFSET <= tz_offset <= MAX_TZ_OFFSET:
+        return jsonify({'error': f'tz_offset must be between {MIN_TZ_OFFSET} and {MAX_TZ_OFFSET}'}), 400
+
+    key = (user_id, upcoming_limit, tz_offset)
+    summary = _summary_cache.get(key)
+    if summary is None:
+        try:
+            summary = _build_summary(user_id, upcoming_limit, tz_offset)
+        except Exception as e:
+            log_error("Get dashboard summary failed", error=e, userId=user_id)
+            return jsonify({'error': 'Failed to retrieve dashboard summary'}), 500
+        _summary_cache.set(key, summary)
+
+    return jsonify(summary), 200
@@ -1,46 +1,19 @@
-from flask import Blueprint, jsonify
-from extensions import db
-from sqlalchemy import text
-from utils.logging import log_info, log_error
-import requests
-import os
+from flask import Blueprint, current_app, jsonify, request
+from tasks.health_probe import get_health_probe, run_health_checks
 
 health_bp = Blueprint('health', __name__)
 
 @health_bp.route('', methods=['GET'])
 def health_check():
-    """Health check endpoint for Railway and monitoring"""
-    try:
-        # Check database connection
-        db.session.execute(text('SELECT 1'))
-        db_status = 'healthy'
-        log_info("Health check passed", database="healthy")
-    except Exception as e:
-        db_status = f'unhealthy: {str(e)}'
-        log_error("Health check failed", error=e, database="unhealthy")
-    
-    # Check frontend availability
-    frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
-    frontend_status = 'unknown'
-    try:
-        response = requests.get(frontend_url, timeout=2)
-        if response.status_code == 200:
-            frontend_status = 'healthy'
-        else:
-            frontend_status = f'unhealthy: status {response.status_code}'
-    except requests.exceptions.ConnectionError:
-        frontend_status = 'unhealthy: connection refused'
-    except requests.exceptions.Timeout:
-        frontend_status = 'unhealthy: timeout'
-    except Exception as e:
-        frontend_status = f'unhealthy: {str(e)}'
-    
-    return jsonify({
-        'status': 'ok',
-        'database': db_status,
-        'frontend': frontend_status,
-        'frontend_url': frontend_url,
-        'service': 'poke-sup-backend'
-    }), 200
+    """
+    Health check endpoint for Railway and monitoring
 
+    通常はバックグラウンドのプローブが保持しているスナップショットを返す（age_seconds は経過秒数）。
+    ?deep=true の場合はその場ですべての確認を実行する
+    """
+    if request.args.get('deep', 'false').lower() in ('true', '1', 'yes'):
+        snapshot = run_health_checks(current_app._get_current_object(), deep=True)
+        return jsonify({**snapshot, 'age_seconds': 0, 'mode': 'deep'}), 200
 
+    snapshot = get_health_probe(current_app._get_current_object()).get_snapshot()
+    return jsonify({**snapshot, 'mode': 'cached'}), 200
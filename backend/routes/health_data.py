@@ -1,14 +1,35 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from extensions import db
-from models import HealthData, User
+from models import HealthData, LatestHealthValue, User
 from datetime import datetime
+import csv
+import io
+import json
+from sqlalchemy import case, func, insert, select
 from utils import get_default_user_id
+from utils.health_metrics import (
+    AGGREGATE_BUCKETS, bucket_expression, record_latest_value, refresh_goal_progress, refresh_latest_values
+)
+from utils.logging import log_info, log_error, log_warn
+from utils.recurrence import to_naive_utc
 
 health_data_bp = Blueprint('health_data', __name__)
 
-@health_data_bp.route('', methods=['GET'])
-def get_health_data():
-    user_id = get_default_user_id()
+# 一括登録で1リクエストに含められる最大件数
+MAX_BATCH_SIZE = 5000
+
+# ストリーミング時にデータベースから一度に読み出す件数
+STREAM_BATCH_SIZE = 500
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_COLUMNS = ['id', 'data_type', 'value', 'unit', 'notes', 'recorded_at', 'created_at']
+
+def _filtered_health_data_query(user_id):
+    """
+    リクエストのクエリパラメータ（data_type, start_date, end_date）で絞り込んだクエリ
+
+    start_date / end_date が ISO 形式でない場合は ValueError
+    """
     data_type = request.args.get('data_type')
     
     query = HealthData.query.filter_by(user_id=user_id)
@@ -25,10 +46,172 @@ def get_health_data():
     if end_date:
         query = query.filter(HealthData.recorded_at <= datetime.fromisoformat(end_date))
     
-    health_data = query.order_by(HealthData.recorded_at.desc()).all()
+    return query.order_by(HealthData.recorded_at.desc())
+
+def _stream_rows(query):
+    """サーバーサイドカーソルで少しずつ読み出しながら1行ずつ返す"""
+    return query.yield_per(STREAM_BATCH_SIZE)
+
+def _generate_json_array(query):
+    yield '['
+    for index, data in enumerate(_stream_rows(query)):
+        yield (',' if index else '') + json.dumps(data.to_dict(), ensure_ascii=False)
+    yield ']'
+
+def _generate_ndjson(query):
+    for data in _stream_rows(query):
+        yield json.dumps(data.to_dict(), ensure_ascii=False) + '\n'
+
+def _generate_csv(query):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    
+    for index, data in enumerate(_stream_rows(query), start=1):
+        row = data.to_dict()
+        writer.writerow([row[column] for column in EXPORT_COLUMNS])
+        # 一定行数ごとにまとめて送信
+        if index % STREAM_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    yield buffer.getvalue()
+
+@health_data_bp.route('', methods=['GET'])
+def get_health_data():
+    user_id = get_default_user_id()
+    try:
+        query = _filtered_health_data_query(user_id)
+    except ValueError:
+        return jsonify({'error': 'start_date and end_date must be ISO format'}), 400
+    
+    # stream=true の場合は全件をメモリに載せずに JSON 配列を逐次送信
+    if request.args.get('stream', 'false').lower() in ('true', '1', 'yes'):
+        return Response(stream_with_context(_generate_json_array(query)), mimetype='application/json')
+    
+    health_data = query.all()
     
     return jsonify([data.to_dict() for data in health_data]), 200
 
+@health_data_bp.route('/latest', methods=['GET'])
+def get_latest_health_data():
+    """データタイプごとの最新の健康データ（現在のバイタル）を取得する"""
+    user_id = get_default_user_id()
+    data_type = request.args.get('data_type')
+    
+    query = LatestHealthValue.query.filter_by(user_id=user_id)
+    
+    if data_type:
+        query = query.filter_by(data_type=data_type)
+    
+    latest_values = query.order_by(LatestHealthValue.data_type).all()
+    
+    return jsonify([latest.to_dict() for latest in latest_values]), 200
+
+@health_data_bp.route('/export', methods=['GET'])
+def export_health_data():
+    """健康データを CSV または NDJSON でストリーミング出力する"""
+    user_id = get_default_user_id()
+    export_format = request.args.get('format', 'csv')
+    
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    try:
+        query = _filtered_health_data_query(user_id)
+    except ValueError:
+        return jsonify({'error': 'start_date and end_date must be ISO format'}), 400
+    
+    if export_format == 'csv':
+        body, mimetype = _generate_csv(query), 'text/csv'
+    else:
+        body, mimetype = _generate_ndjson(query), 'application/x-ndjson'
+    
+    filename = f"health_data_{datetime.utcnow().strftime('%Y%m%d')}.{export_format}"
+    
+    log_info("Health data export started", userId=user_id, format=export_format)
+    
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@health_data_bp.route('/aggregate', methods=['GET'])
+def get_health_data_aggregate():
+    """グラフ表示用に、期間内の健康データを時間バケットごとに集計する"""
+    user_id = get_default_user_id()
+    data_type = request.args.get('data_type')
+    bucket = request.args.get('bucket', 'day')
+    
+    if not data_type:
+        return jsonify({'error': 'data_type is required'}), 400
+    
+    if bucket not in AGGREGATE_BUCKETS:
+        return jsonify({'error': f"bucket must be one of: {', '.join(AGGREGATE_BUCKETS)}"}), 400
+    
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        start_date = datetime.fromisoformat(start_date) if start_date else None
+        end_date = datetime.fromisoformat(end_date) if end_date else None
+    except ValueError:
+        return jsonify({'error': 'start_date and end_date must be ISO format'}), 400
+    
+    bucket_start = bucket_expression(bucket)
+    
+    # バケット内の最新値を求めるため、新しい順の行番号を付ける
+    readings = select(
+        bucket_start.label('bucket_start'),
+        HealthData.value,
+        func.row_number().over(
+            partition_by=bucket_start,
+            order_by=(HealthData.recorded_at.desc(), HealthData.id.desc())
+        ).label('row_number')
+    ).where(
+        HealthData.user_id == user_id,
+        HealthData.data_type == data_type
+    )
+    if start_date:
+        readings = readings.where(HealthData.recorded_at >= start_date)
+    if end_date:
+        readings = readings.where(HealthData.recorded_at <= end_date)
+    readings = readings.subquery()
+    
+    rows = db.session.execute(
+        select(
+            readings.c.bucket_start,
+            func.count().label('count'),
+            func.min(readings.c.value).label('min'),
+            func.max(readings.c.value).label('max'),
+            func.avg(readings.c.value).label('avg'),
+            func.max(case((readings.c.row_number == 1, readings.c.value))).label('last')
+        ).group_by(readings.c.bucket_start).order_by(readings.c.bucket_start)
+    ).all()
+    
+    points = []
+    for row in rows:
+        bucket_value = row.bucket_start
+        if isinstance(bucket_value, str):
+            bucket_value = datetime.fromisoformat(bucket_value)
+        points.append({
+            'bucket_start': bucket_value.isoformat() if bucket_value else None,
+            'count': row.count,
+            'min': row.min,
+            'max': row.max,
+            'avg': float(row.avg) if row.avg is not None else None,
+            'last': row.last
+        })
+    
+    return jsonify({
+        'data_type': data_type,
+        'bucket': bucket,
+        'start_date': start_date.isoformat() if start_date else None,
+        'end_date': end_date.isoformat() if end_date else None,
+        'points': points
+    }), 200
+
 @health_data_bp.route('', methods=['POST'])
 def create_health_data():
     user_id = get_default_user_id()
@@ -44,14 +227,98 @@ def create_health_data():
         value=data['value'],
         unit=data.get('unit'),
         notes=data.get('notes'),
-        recorded_at=datetime.fromisoformat(data['recorded_at']) if data.get('recorded_at') else datetime.utcnow()
+        recorded_at=to_naive_utc(datetime.fromisoformat(data['recorded_at'])) if data.get('recorded_at') else datetime.utcnow()
     )
     
     db.session.add(health_data)
+    record_latest_value(health_data)
+    refresh_goal_progress(user_id, [health_data.data_type])
     db.session.commit()
     
     return jsonify(health_data.to_dict()), 201
 
+def _parse_reading(item, user_id, now):
+    """一括登録の1件を検証し、INSERT 用の dict を返す（不正な場合は ValueError）"""
+    if not isinstance(item, dict):
+        raise ValueError('reading must be an object')
+    
+    data_type = item.get('data_type')
+    if not isinstance(data_type, str) or not data_type or len(data_type) > 50:
+        raise ValueError('data_type is required (max 50 characters)')
+    
+    value = item.get('value')
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError('value must be a number')
+    
+    unit = item.get('unit')
+    if unit is not None and (not isinstance(unit, str) or len(unit) > 20):
+        raise ValueError('unit must be a string (max 20 characters)')
+    
+    notes = item.get('notes')
+    if notes is not None and not isinstance(notes, str):
+        raise ValueError('notes must be a string')
+    
+    recorded_at = item.get('recorded_at')
+    if recorded_at is None:
+        recorded_at = now
+    else:
+        try:
+            recorded_at = to_naive_utc(datetime.fromisoformat(recorded_at))
+        except (TypeError, ValueError):
+            raise ValueError('recorded_at must be ISO format')
+    
+    return {
+        'user_id': user_id,
+        'data_type': data_type,
+        'value': float(value),
+        'unit': unit,
+        'notes': notes,
+        'recorded_at': recorded_at,
+        'created_at': now
+    }
+
+@health_data_bp.route('/batch', methods=['POST'])
+def create_health_data_batch():
+    """デバイス同期用に、複数の健康データを1トランザクションで一括登録する"""
+    user_id = get_default_user_id()
+    data = request.get_json(silent=True)
+    readings = data if isinstance(data, list) else (data or {}).get('readings')
+    
+    if not isinstance(readings, list) or not readings:
+        return jsonify({'error': 'readings must be a non-empty array'}), 400
+    
+    if len(readings) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Too many readings (max {MAX_BATCH_SIZE})'}), 400
+    
+    now = datetime.utcnow()
+    rows = []
+    errors = []
+    for index, item in enumerate(readings):
+        try:
+            rows.append(_parse_reading(item, user_id, now))
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+    
+    if not rows:
+        log_warn("Health data batch rejected", userId=user_id, count=len(readings), error_count=len(errors))
+        return jsonify({'inserted': 0, 'errors': errors}), 400
+    
+    try:
+        # executemany でまとめて INSERT（PostgreSQL では複数行 VALUES にまとめて送信される）
+        db.session.execute(insert(HealthData), rows)
+        data_types = {row['data_type'] for row in rows}
+        refresh_latest_values(user_id, data_types)
+        refresh_goal_progress(user_id, data_types)
+        db.session.commit()
+    except Exception as e:
+        log_error("Health data batch insert failed", error=e, userId=user_id, count=len(rows))
+        db.session.rollback()
+        return jsonify({'error': 'Failed to save health data'}), 500
+    
+    log_info("Health data batch inserted", userId=user_id, inserted=len(rows), error_count=len(errors))
+    
+    return jsonify({'inserted': len(rows), 'errors': errors}), 201
+
 @health_data_bp.route('/<int:data_id>', methods=['PUT'])
 def update_health_data(data_id):
     user_id = get_default_user_id()
@@ -72,8 +339,10 @@ def update_health_data(data_id):
     if 'notes' in data:
         health_data.notes = data['notes']
     if 'recorded_at' in data:
-        health_data.recorded_at = datetime.fromisoformat(data['recorded_at'])
+        health_data.recorded_at = to_naive_utc(datetime.fromisoformat(data['recorded_at']))
     
+    refresh_latest_values(user_id, [health_data.data_type])
+    refresh_goal_progress(user_id, [health_data.data_type])
     db.session.commit()
     
     return jsonify(health_data.to_dict()), 200
@@ -90,6 +359,8 @@ def delete_health_data(data_id):
         return jsonify({'error': 'Unauthorized'}), 403
     
     db.session.delete(health_data)
+    refresh_latest_values(user_id, [health_data.data_type])
+    refresh_goal_progress(user_id, [health_data.data_type])
     db.session.commit()
     
     return jsonify({'message': 'Health data deleted'}), 200
@@ -1,8 +1,9 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
-from models import HealthGoal, HealthData
+from models import HealthGoal
 from datetime import datetime
 from utils import get_default_user_id
+from utils.health_metrics import apply_goal_progress, get_goal_progress, get_latest_health_values
 
 health_goals_bp = Blueprint('health_goals', __name__)
 
@@ -11,20 +12,10 @@ def get_health_goals():
     user_id = get_default_user_id()
     goals = HealthGoal.query.filter_by(user_id=user_id).all()
     
-    # Update current_value from latest health data
-    for goal in goals:
-        latest_data = HealthData.query.filter_by(
-            user_id=user_id,
-            data_type=goal.data_type
-        ).order_by(HealthData.recorded_at.desc()).first()
-        
-        if latest_data:
-            goal.current_value = latest_data.value
-            # Check if goal is achieved
-            goal.is_achieved = goal.current_value >= goal.target_value if goal.target_value > 0 else goal.current_value <= abs(goal.target_value)
-            db.session.commit()
-    
-    return jsonify([goal.to_dict() for goal in goals]), 200
+    # 最新の健康データを1回のクエリで取得し、書き込みせずに進捗を反映
+    latest_values = get_latest_health_values(user_id, {goal.data_type for goal in goals})
+    
+    return jsonify([get_goal_progress(goal, latest_values) for goal in goals]), 200
 
 @health_goals_bp.route('', methods=['POST'])
 def create_health_goal():
@@ -43,6 +34,9 @@ def create_health_goal():
         deadline=datetime.fromisoformat(data['deadline']) if data.get('deadline') else None
     )
     
+    latest_values = get_latest_health_values(user_id, [goal.data_type])
+    apply_goal_progress(goal, latest_values.get(goal.data_type))
+    
     db.session.add(goal)
     db.session.commit()
     
@@ -68,6 +62,11 @@ def update_health_goal(goal_id):
     if 'deadline' in data:
         goal.deadline = datetime.fromisoformat(data['deadline']) if data['deadline'] else None
     
+    if 'target_value' in data:
+        # 目標値の変更で達成状況が変わる場合があるため再評価
+        latest_values = get_latest_health_values(user_id, [goal.data_type])
+        apply_goal_progress(goal, latest_values.get(goal.data_type))
+    
     goal.updated_at = datetime.utcnow()
     db.session.commit()
     
@@ -1,12 +1,21 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from extensions import db
 from models import Message, Conversation, User
 from datetime import datetime
+from sqlalchemy import tuple_
 from utils.logging import log_info, log_error, log_warn
 from utils import get_default_user_id
+from utils.read_state import (
+    get_recipient_id, mark_read_up_to, record_deleted_message, record_message_read, record_new_message
+)
+from tasks.message_writer import conversation_room, emit_unread_deltas
 
 messages_bp = Blueprint('messages', __name__)
 
+# メッセージ履歴のページサイズ
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
 @messages_bp.route('/conversation/<int:conversation_id>', methods=['GET'])
 def get_messages(conversation_id):
     user_id = get_default_user_id()
@@ -18,9 +27,65 @@ def get_messages(conversation_id):
     if conversation.patient_id != user_id and conversation.provider_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.created_at).all()
-    
-    return jsonify([msg.to_dict() for msg in messages]), 200
+    before = request.args.get('before', type=int)
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    
+    if before and after:
+        return jsonify({'error': 'before and after cannot be used together'}), 400
+    
+    query = Message.query.filter_by(conversation_id=conversation_id)
+    sort_key = tuple_(Message.created_at, Message.id)
+    
+    # カーソル（メッセージID）を (created_at, id) に解決してキーセットで絞り込む
+    cursor_id = before or after
+    if cursor_id:
+        cursor = db.session.query(Message.created_at, Message.id).filter_by(
+            id=cursor_id,
+            conversation_id=conversation_id
+        ).first()
+        if not cursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        cursor_key = tuple_(cursor.created_at, cursor.id)
+    
+    if after:
+        # 指定メッセージより新しいページ（古い順）
+        query = query.filter(sort_key > cursor_key).order_by(Message.created_at, Message.id)
+    else:
+        # 最新ページ、または指定メッセージより古いページ（新しい順で取得して反転）
+        if before:
+            query = query.filter(sort_key < cursor_key)
+        query = query.order_by(Message.created_at.desc(), Message.id.desc())
+    
+    # 1件多く取得して次ページの有無を判定
+    messages = query.limit(limit + 1).all()
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if not after:
+        messages.reverse()
+    
+    next_cursor = None
+    if has_more and messages:
+        next_cursor = messages[-1].id if after else messages[0].id
+    
+    return jsonify({
+        'messages': Message.to_dict_list(messages),
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    }), 200
+
+def _broadcast_new_message(message, recipient_id):
+    """REST で作成したメッセージも、ソケット経由と同じく new_message と unread_delta を送信する"""
+    socketio = current_app.extensions.get('socketio')
+    if socketio is None:
+        return
+    try:
+        socketio.emit('new_message', Message.to_dict_list([message])[0], room=conversation_room(message.conversation_id))
+        emit_unread_deltas(socketio, {(recipient_id, message.conversation_id): 1})
+    except Exception as e:
+        # 保存は完了しているため、配信に失敗してもリクエストは成功として返す
+        log_warn("Broadcast new message failed", error=str(e), messageId=message.id)
 
 @messages_bp.route('', methods=['POST'])
 def create_message():
@@ -52,10 +117,13 @@ def create_message():
         )
         
         db.session.add(message)
+        record_new_message(conversation, message)
         conversation.updated_at = datetime.utcnow()
+        recipient_id = get_recipient_id(conversation, user_id)
         db.session.commit()
         
         log_info("Message created", messageId=message.id, conversationId=conversation_id, userId=user_id, contentLength=len(content))
+        _broadcast_new_message(message, recipient_id)
         
         return jsonify(message.to_dict()), 201
     except Exception as e:
@@ -96,6 +164,7 @@ def delete_message(message_id):
     if message.user_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
+    record_deleted_message(message.conversation, message)
     db.session.delete(message)
     db.session.commit()
     
@@ -113,7 +182,43 @@ def mark_as_read(message_id):
     if conversation.patient_id != user_id and conversation.provider_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
+    record_message_read(message, user_id)
     message.is_read = True
     db.session.commit()
     
     return jsonify(message.to_dict()), 200
+
+@messages_bp.route('/conversation/<int:conversation_id>/read', methods=['PUT'])
+def mark_conversation_as_read(conversation_id):
+    """指定メッセージ（省略時は最新メッセージ）までをまとめて既読にする"""
+    user_id = get_default_user_id()
+    conversation = Conversation.query.get(conversation_id)
+    
+    if not conversation:
+        return jsonify({'error': 'Conversation not found'}), 404
+    
+    if conversation.patient_id != user_id and conversation.provider_id != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    message_id = data.get('message_id')
+    
+    if message_id is None:
+        message_id = db.session.query(db.func.max(Message.id)).filter_by(conversation_id=conversation_id).scalar()
+        if message_id is None:
+            return jsonify({'conversation_id': conversation_id, 'last_read_message_id': None, 'unread_count': 0}), 200
+    elif isinstance(message_id, bool) or not isinstance(message_id, int):
+        return jsonify({'error': 'message_id must be an integer'}), 400
+    elif db.session.query(Message.id).filter_by(id=message_id, conversation_id=conversation_id).first() is None:
+        # 既読位置は戻らないため、会話にないIDを既読位置にしない
+        return jsonify({'error': 'Message not found in this conversation'}), 404
+    
+    try:
+        state = mark_read_up_to(conversation_id, user_id, message_id)
+        db.session.commit()
+    except Exception as e:
+        log_error("Mark conversation as read failed", error=e, userId=user_id, conversation_id=conversation_id)
+        db.session.rollback()
+        return jsonify({'error': 'Failed to mark messages as read'}), 500
+    
+    return jsonify(state.to_dict()), 200
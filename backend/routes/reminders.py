@@ -1,12 +1,17 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
 from models import Reminder, User
-from datetime import datetime
+from datetime import datetime, timedelta
 from utils.logging import log_info, log_error, log_warn
 from utils import get_default_user_id
+from utils.recurrence import get_occurrences, invalidate_occurrences, to_naive_utc
+from tasks.reminder_dispatcher import notify_reminder_changed, notify_reminder_deleted
 
 reminders_bp = Blueprint('reminders', __name__)
 
+# 発生予定を展開できる最大期間
+MAX_OCCURRENCE_WINDOW = timedelta(days=366)
+
 @reminders_bp.route('', methods=['GET'])
 def get_reminders():
     try:
@@ -45,6 +50,40 @@ def get_reminders():
                  path=request.path)
         return jsonify({'error': 'Failed to retrieve reminders', 'details': str(e)}), 500
 
+@reminders_bp.route('/occurrences', methods=['GET'])
+def get_reminder_occurrences():
+    """繰り返しを展開した、指定期間内のリマインダーの発生予定を取得する"""
+    user_id = get_default_user_id()
+    start = request.args.get('start')
+    end = request.args.get('end')
+    
+    if not start or not end:
+        return jsonify({'error': 'start and end are required'}), 400
+    
+    try:
+        window_start = to_naive_utc(datetime.fromisoformat(start))
+        window_end = to_naive_utc(datetime.fromisoformat(end))
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO format'}), 400
+    
+    if window_end <= window_start:
+        return jsonify({'error': 'end must be after start'}), 400
+    
+    if window_end - window_start > MAX_OCCURRENCE_WINDOW:
+        return jsonify({'error': f'Window must not exceed {MAX_OCCURRENCE_WINDOW.days} days'}), 400
+    
+    try:
+        occurrences = get_occurrences(user_id, window_start, window_end)
+    except Exception as e:
+        log_error("Get reminder occurrences failed", error=e, userId=user_id, start=start, end=end)
+        return jsonify({'error': 'Failed to retrieve reminder occurrences'}), 500
+    
+    return jsonify({
+        'start': window_start.isoformat(),
+        'end': window_end.isoformat(),
+        'occurrences': occurrences
+    }), 200
+
 @reminders_bp.route('', methods=['POST'])
 def create_reminder():
     user_id = get_default_user_id()
@@ -67,6 +106,8 @@ def create_reminder():
     
     db.session.add(reminder)
     db.session.commit()
+    invalidate_occurrences(user_id)
+    notify_reminder_changed(reminder)
     
     return jsonify(reminder.to_dict()), 201
 
@@ -101,6 +142,8 @@ def update_reminder(reminder_id):
         reminder.end_date = datetime.fromisoformat(data['end_date']) if data['end_date'] else None
     
     db.session.commit()
+    invalidate_occurrences(user_id)
+    notify_reminder_changed(reminder)
     
     return jsonify(reminder.to_dict()), 200
 
@@ -117,6 +160,8 @@ def delete_reminder(reminder_id):
     
     db.session.delete(reminder)
     db.session.commit()
+    invalidate_occurrences(user_id)
+    notify_reminder_deleted(reminder_id)
     
     return jsonify({'message': 'Reminder deleted'}), 200
 
@@ -133,6 +178,8 @@ def complete_reminder(reminder_id):
     
     reminder.is_completed = True
     db.session.commit()
+    invalidate_occurrences(user_id)
+    notify_reminder_changed(reminder)
     
     return jsonify(reminder.to_dict()), 200
 
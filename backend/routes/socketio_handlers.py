@@ -3,9 +3,40 @@ from flask_jwt_extended import decode_token
 from flask import request
 from extensions import db
 from models import Message, Conversation
+from utils.read_state import get_recipient_id, record_new_message
+from tasks.reminder_dispatcher import user_room
+from tasks.message_writer import (
+    MAX_CLIENT_MESSAGE_ID_LENGTH, conversation_room, emit_unread_deltas, find_persisted_message_ids,
+    get_message_writer, new_pending_message, provisional_message_dict
+)
+from utils.identity import get_user_dict
+from utils.membership import (
+    authorize_session, check_membership, forget_session, is_session_authorized, load_user_conversation_ids
+)
+from utils.presence import get_presence_registry
 
-# Store user sessions
-user_sessions = {}
+def _author_summary(user_id):
+    """配信するメッセージに埋め込む投稿者の簡易表現（User.to_summary_dict と同じ形）"""
+    user = get_user_dict(user_id)
+    if user is None:
+        return None
+    return {'id': user['id'], 'name': user['name'], 'role': user['role']}
+
+def _authorize_conversation(user_id, conversation_id):
+    """
+    セッションが会話に参加できるか確認し、できない場合はエラーメッセージを返す
+
+    確認済みの会話はセッションごとに覚えるため、同じ会話への2回目以降の送信ではクエリを実行しない
+    """
+    if is_session_authorized(request.sid, conversation_id):
+        return None
+    is_member = check_membership(user_id, conversation_id)
+    if is_member is None:
+        return 'Conversation not found'
+    if not is_member:
+        return 'Unauthorized'
+    authorize_session(request.sid, user_id, conversation_id)
+    return None
 
 def register_socketio_handlers(socketio: SocketIO):
     
@@ -17,10 +48,19 @@ def register_socketio_handlers(socketio: SocketIO):
             
             token = auth['token']
             decoded = decode_token(token)
-            user_id = decoded['sub']
+            user_id = int(decoded['sub'])
+            
+            # Store user_id in the presence registry (shared between workers when configured)
+            get_presence_registry().add_session(request.sid, user_id)
             
-            # Store user_id in session
-            user_sessions[request.sid] = user_id
+            # ユーザー宛ての通知（reminder_due など）を受け取るルーム
+            join_room(user_room(user_id))
+            
+            # 参加しているすべての会話のルームに1回のクエリで参加させる（会話ごとの join_conversation は不要）
+            conversation_ids = load_user_conversation_ids(user_id)
+            for conversation_id in conversation_ids:
+                join_room(conversation_room(conversation_id))
+            authorize_session(request.sid, user_id, *conversation_ids)
             
             return True
         except Exception as e:
@@ -30,14 +70,14 @@ def register_socketio_handlers(socketio: SocketIO):
     @socketio.on('disconnect')
     def handle_disconnect():
         # Remove user session
-        if request.sid in user_sessions:
-            del user_sessions[request.sid]
+        get_presence_registry().remove_session(request.sid)
+        forget_session(request.sid)
         print('Client disconnected')
     
     @socketio.on('join_conversation')
     def handle_join_conversation(data):
         try:
-            user_id = user_sessions.get(request.sid)
+            user_id = get_presence_registry().get_user_id(request.sid)
             if not user_id:
                 emit('error', {'message': 'Not authenticated'})
                 return
@@ -47,17 +87,12 @@ def register_socketio_handlers(socketio: SocketIO):
                 emit('error', {'message': 'conversation_id is required'})
                 return
             
-            conversation = Conversation.query.get(conversation_id)
-            if not conversation:
-                emit('error', {'message': 'Conversation not found'})
+            error = _authorize_conversation(user_id, conversation_id)
+            if error:
+                emit('error', {'message': error})
                 return
             
-            if conversation.patient_id != user_id and conversation.provider_id != user_id:
-                emit('error', {'message': 'Unauthorized'})
-                return
-            
-            room = f'conversation_{conversation_id}'
-            join_room(room)
+            join_room(conversation_room(conversation_id))
             emit('joined', {'conversation_id': conversation_id})
         except Exception as e:
             emit('error', {'message': str(e)})
@@ -67,8 +102,7 @@ def register_socketio_handlers(socketio: SocketIO):
         try:
             conversation_id = data.get('conversation_id')
             if conversation_id:
-                room = f'conversation_{conversation_id}'
-                leave_room(room)
+                leave_room(conversation_room(conversation_id))
                 emit('left', {'conversation_id': conversation_id})
         except Exception as e:
             emit('error', {'message': str(e)})
@@ -76,40 +110,65 @@ def register_socketio_handlers(socketio: SocketIO):
     @socketio.on('send_message')
     def handle_send_message(data):
         try:
-            user_id = user_sessions.get(request.sid)
+            user_id = get_presence_registry().get_user_id(request.sid)
             if not user_id:
                 emit('error', {'message': 'Not authenticated'})
                 return
             
             conversation_id = data.get('conversation_id')
             content = data.get('content')
+            client_message_id = data.get('client_message_id')
             
             if not conversation_id or not content:
                 emit('error', {'message': 'conversation_id and content are required'})
                 return
             
-            conversation = Conversation.query.get(conversation_id)
-            if not conversation:
-                emit('error', {'message': 'Conversation not found'})
+            if client_message_id is not None and (
+                not isinstance(client_message_id, str) or not 0 < len(client_message_id) <= MAX_CLIENT_MESSAGE_ID_LENGTH
+            ):
+                emit('error', {'message': f'client_message_id must be a string (max {MAX_CLIENT_MESSAGE_ID_LENGTH} characters)'})
                 return
             
-            if conversation.patient_id != user_id and conversation.provider_id != user_id:
-                emit('error', {'message': 'Unauthorized'})
+            error = _authorize_conversation(user_id, conversation_id)
+            if error:
+                emit('error', {'message': error})
                 return
             
+            room = conversation_room(conversation_id)
+            
+            # write-behind が有効な場合は仮IDですぐに配信し、保存はライターのグループコミットに任せる
+            writer = get_message_writer()
+            if writer is not None:
+                pending = new_pending_message(request.sid, conversation_id, user_id, content,
+                                              client_message_id=client_message_id)
+                if writer.submit(pending):
+                    emit('new_message', provisional_message_dict(pending, _author_summary(user_id)), room=room)
+                    return {'provisional_id': pending.provisional_id}
+            
+            if client_message_id:
+                # 確認応答を受け取れなかった送信者の再送（保存済みなら既存のIDを返す）
+                persisted = find_persisted_message_ids([(user_id, client_message_id)])
+                if persisted:
+                    return {'id': persisted[(user_id, client_message_id)]}
+            
+            conversation = db.session.get(Conversation, conversation_id)
             message = Message(
                 conversation_id=conversation_id,
                 user_id=user_id,
-                content=content
+                content=content,
+                client_message_id=client_message_id
             )
             
             db.session.add(message)
+            record_new_message(conversation, message)
             from datetime import datetime
             conversation.updated_at = datetime.utcnow()
+            recipient_id = get_recipient_id(conversation, user_id)
             db.session.commit()
             
-            room = f'conversation_{conversation_id}'
-            emit('new_message', message.to_dict(), room=room)
+            emit('new_message', Message.to_dict_list([message])[0], room=room)
+            emit_unread_deltas(socketio, {(recipient_id, conversation_id): 1})
+            return {'id': message.id}
             
         except Exception as e:
             emit('error', {'message': str(e)})
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
 from models import User, UserRole
+from utils import get_user_dict
 
 users_bp = Blueprint('users', __name__)
 
@@ -38,11 +39,11 @@ def get_users():
 
 @users_bp.route('/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    user = User.query.get(user_id)
+    user = get_user_dict(user_id)
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    return jsonify(user.to_dict()), 200
+    return jsonify(user), 200
 
 
@@ -9,6 +9,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import app
 from extensions import db
+from migrations import apply_migrations
 from models import (
     User, UserRole, Conversation, Message, 
     HealthData, Reminder, HealthGoal
@@ -19,6 +20,7 @@ def init_database():
     with app.app_context():
         # Create all tables
         db.create_all()
+        apply_migrations()
         
         # Check if users already exist
         if User.query.count() > 0:
@@ -0,0 +1,27 @@
+"""
+Apply pending schema migrations
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from extensions import db
+from migrations import apply_migrations, get_applied_versions
+
+def migrate():
+    with app.app_context():
+        # Create tables that do not exist yet
+        db.create_all()
+        
+        applied = apply_migrations()
+        if applied:
+            print(f"Applied migrations: {', '.join(applied)}")
+        else:
+            print("Database is up to date.")
+        print(f"Current version: {max(get_applied_versions(), default='none')}")
+
+if __name__ == '__main__':
+    migrate()
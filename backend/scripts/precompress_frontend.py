@@ -0,0 +1,52 @@
+"""
+Write precompressed .gz (and .br when the brotli package is installed) files
+next to the text assets of a static frontend export, for FRONTEND_DIR mode
+
+Usage:
+    python scripts/precompress_frontend.py ../frontend/out
+"""
+import gzip
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.html', '.js', '.css', '.json', '.svg', '.txt', '.xml', '.map', '.ico')
+
+# Files smaller than this are not worth compressing
+MIN_SIZE = 1024
+
+def write_if_smaller(path, data):
+    """Write the compressed variant only when it actually saves bytes"""
+    if len(data) < os.path.getsize(path[:path.rindex('.')]):
+        with open(path, 'wb') as f:
+            f.write(data)
+        return True
+    return False
+
+def precompress(static_dir):
+    written = 0
+    for root, _, files in os.walk(static_dir):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            if os.path.getsize(path) < MIN_SIZE:
+                continue
+            with open(path, 'rb') as f:
+                content = f.read()
+            # mtime=0 keeps the output identical across builds
+            written += write_if_smaller(path + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+            if brotli is not None:
+                written += write_if_smaller(path + '.br', brotli.compress(content))
+    return written
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or not os.path.isdir(sys.argv[1]):
+        print(__doc__)
+        sys.exit(1)
+    count = precompress(sys.argv[1])
+    print(f"Wrote {count} precompressed files{'' if brotli else ' (brotli not installed, .br skipped)'}")
@@ -0,0 +1,4 @@
+"""
+バックグラウンドタスク
+Socket.IO のバックグラウンドタスク（eventlet のグリーンスレッド）として動作する処理
+"""
@@ -0,0 +1,170 @@
+"""
+ヘルスチェックのバックグラウンドプローブ
+データベース・フロントエンド・接続プールの状態を一定間隔で確認してスナップショットを保持し、
+/api/health はリクエストごとに確認せずスナップショットを返す
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+import requests
+from flask_socketio import SocketIO
+from sqlalchemy import text
+from extensions import db
+from migrations import MIGRATIONS, get_applied_versions
+from utils.frontend_proxy import frontend_breaker
+from utils.logging import get_log_stats, log_info, log_warn
+
+FRONTEND_CHECK_TIMEOUT = 2
+
+def _check_database() -> str:
+    try:
+        db.session.execute(text('SELECT 1'))
+        return 'healthy'
+    except Exception as e:
+        return f'unhealthy: {str(e)}'
+    finally:
+        db.session.remove()
+
+def _check_frontend(frontend_url: str, frontend_dir: Optional[str]) -> str:
+    if frontend_dir:
+        # 静的配信モードではビルド済みファイルの有無を確認
+        if os.path.isfile(os.path.join(frontend_dir, 'index.html')):
+            return 'healthy'
+        return 'unhealthy: index.html not found'
+
+    try:
+        response = requests.get(frontend_url, timeout=FRONTEND_CHECK_TIMEOUT)
+        if response.status_code == 200:
+            return 'healthy'
+        return f'unhealthy: status {response.status_code}'
+    except requests.exceptions.ConnectionError:
+        return 'unhealthy: connection refused'
+    except requests.exceptions.Timeout:
+        return 'unhealthy: timeout'
+    except Exception as e:
+        return f'unhealthy: {str(e)}'
+
+def _pool_status() -> dict:
+    """データベース接続プールの使用状況"""
+    pool = db.engine.pool
+    status = {'class': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[name] = method()
+    return status
+
+def _pending_migrations() -> list:
+    try:
+        applied = set(get_applied_versions())
+    except Exception as e:
+        return [f'unknown: {str(e)}']
+    return [migration.VERSION for migration in MIGRATIONS if migration.VERSION not in applied]
+
+def run_health_checks(app, deep: bool = False) -> dict:
+    """
+    すべての確認を実行してスナップショットを作成
+
+    deep=True の場合は、未適用のマイグレーションも確認する
+    """
+    frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
+    frontend_dir = os.environ.get('FRONTEND_DIR')
+    started = time.monotonic()
+
+    with app.app_context():
+        database = _check_database()
+        pool = _pool_status()
+        pending_migrations = _pending_migrations() if deep else None
+
+    snapshot = {
+        'status': 'ok',
+        'database': database,
+        'frontend': _check_frontend(frontend_url, frontend_dir),
+        'frontend_url': frontend_url,
+        'frontend_circuit': frontend_breaker.state,
+        'pool': pool,
+        'logging': get_log_stats(),
+        'service': 'poke-sup-backend',
+        'checked_at': datetime.utcnow().isoformat(),
+        'check_duration_ms': round((time.monotonic() - started) * 1000, 1)
+    }
+    if deep:
+        snapshot['pending_migrations'] = pending_migrations
+    return snapshot
+
+class HealthProbe:
+    """interval 秒ごとにヘルスチェックを実行し、最新のスナップショットを保持する"""
+
+    def __init__(self, app, socketio: Optional[SocketIO], interval: float = 15.0):
+        self.app = app
+        self.socketio = socketio
+        self.interval = interval
+        self._snapshot: Optional[dict] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._running = False
+
+    def start(self) -> None:
+        if self._running or self.socketio is None:
+            return
+        self._running = True
+        self.socketio.start_background_task(self._run)
+        log_info("Health probe started", interval_seconds=self.interval)
+
+    def stop(self) -> None:
+        self._running = False
+
+    def _run(self) -> None:
+        while self._running:
+            try:
+                self.refresh()
+            except Exception as e:
+                log_warn("Health probe iteration failed", error=str(e))
+            self.socketio.sleep(self.interval)
+
+    def refresh(self) -> dict:
+        snapshot = run_health_checks(self.app)
+        with self._lock:
+            previous = self._snapshot
+            self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+
+        # 状態が変わったときだけログに出す
+        if previous is None or (previous['database'], previous['frontend']) != (snapshot['database'], snapshot['frontend']):
+            log_info("Health status changed", database=snapshot['database'], frontend=snapshot['frontend'])
+        return snapshot
+
+    def get_snapshot(self) -> dict:
+        """
+        キャッシュしたスナップショットを返す（経過秒数 age_seconds 付き）
+
+        バックグラウンドで動いていない場合（gunicorn ワーカーなど）や古くなった場合は、その場で更新する
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            age = time.monotonic() - self._checked_at
+        if snapshot is None or age > self.interval * 2:
+            snapshot = self.refresh()
+            age = 0.0
+        return {**snapshot, 'age_seconds': round(age, 3)}
+
+_probe: Optional[HealthProbe] = None
+_probe_lock = threading.Lock()
+
+def get_health_probe(app, socketio: Optional[SocketIO] = None) -> HealthProbe:
+    """プロセスごとに1つのプローブを返す"""
+    global _probe
+    if _probe is None:
+        with _probe_lock:
+            if _probe is None:
+                _probe = HealthProbe(app, socketio, interval=app.config.get('HEALTH_PROBE_INTERVAL', 15))
+    return _probe
+
+def start_health_probe(app, socketio: SocketIO) -> HealthProbe:
+    """プローブをバックグラウンドタスクとして起動"""
+    probe = get_health_probe(app, socketio)
+    probe.socketio = socketio
+    probe.start()
+    return probe
@@ -0,0 +1,294 @@
+"""
+ソケット経由のチャットメッセージのグループコミット（write-behind）
+
+送信されたメッセージは仮ID（provisional_id）付きですぐに会話ルームへ配信し、
+全接続のメッセージを短い時間枠（数ミリ秒）または一定件数ごとに集めて1トランザクションで保存する。
+コミットが完了したら message_persisted を会話ルームに送信する（送信者への確認応答を兼ねる）。
+保存に失敗したバッチは再試行し、それでも保存できなければ送信者に message_failed を送る。
+
+保存待ちのメッセージはプロセス内にしかないため、確認応答を受け取るまで送信者が
+同じ client_message_id で再送する（少なくとも1回の保存）。保存済みの client_message_id は
+(user_id, client_message_id) のユニークインデックスで確認し、重複して保存しない
+"""
+import atexit
+import queue
+import threading
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from flask_socketio import SocketIO
+from extensions import db
+from models import Conversation, Message
+from utils.logging import log_info, log_warn, log_error
+from utils.read_state import record_new_messages
+from tasks.reminder_dispatcher import user_room
+
+PendingMessage = namedtuple('PendingMessage', [
+    'provisional_id', 'client_message_id', 'sid', 'conversation_id', 'user_id', 'content', 'created_at'
+])
+
+def conversation_room(conversation_id) -> str:
+    """会話ごとの Socket.IO ルーム名"""
+    return f'conversation_{conversation_id}'
+
+# client_message_id の最大長（messages.client_message_id のカラム長）
+MAX_CLIENT_MESSAGE_ID_LENGTH = 64
+
+def provisional_id_for(user_id: int, client_message_id: Optional[str]) -> str:
+    """
+    仮IDを決める
+
+    client_message_id がある場合は再送しても同じ仮IDになるようにし、受信側で重複を除けるようにする
+    """
+    if client_message_id:
+        return f'{user_id}:{client_message_id}'
+    return uuid.uuid4().hex
+
+def new_pending_message(sid: str, conversation_id: int, user_id: int, content: str,
+                        client_message_id: Optional[str] = None) -> PendingMessage:
+    """仮IDと作成日時（サーバー時刻）を割り当てた保存待ちメッセージを作成"""
+    return PendingMessage(
+        provisional_id=provisional_id_for(user_id, client_message_id),
+        client_message_id=client_message_id,
+        sid=sid,
+        conversation_id=conversation_id,
+        user_id=user_id,
+        content=content,
+        created_at=datetime.utcnow()
+    )
+
+def provisional_message_dict(pending: PendingMessage, author: Optional[dict]) -> dict:
+    """保存前に配信するメッセージ（Message.to_dict_list と同じ形で id は None）"""
+    return {
+        'id': None,
+        'provisional_id': pending.provisional_id,
+        'client_message_id': pending.client_message_id,
+        'conversation_id': pending.conversation_id,
+        'user_id': pending.user_id,
+        'user': author,
+        'content': pending.content,
+        'is_read': False,
+        'created_at': pending.created_at.isoformat()
+    }
+
+def emit_unread_deltas(socketio: SocketIO, deltas: Dict[Tuple[int, int], int]) -> None:
+    """(受信者ID, 会話ID) ごとの未読件数の増分を受信者のユーザールームに送信"""
+    for (recipient_id, conversation_id), delta in deltas.items():
+        socketio.emit('unread_delta', {'conversation_id': conversation_id, 'delta': delta}, room=user_room(recipient_id))
+
+def find_persisted_message_ids(keys: Iterable[Tuple[int, str]]) -> Dict[Tuple[int, str], int]:
+    """(user_id, client_message_id) ごとに、保存済みのメッセージIDを返す"""
+    keys = set(keys)
+    if not keys:
+        return {}
+    rows = db.session.query(Message.id, Message.user_id, Message.client_message_id).filter(
+        Message.user_id.in_({user_id for user_id, _ in keys}),
+        Message.client_message_id.in_({client_message_id for _, client_message_id in keys})
+    ).all()
+    return {
+        (row.user_id, row.client_message_id): row.id
+        for row in rows if (row.user_id, row.client_message_id) in keys
+    }
+
+def persist_messages(batch: List[PendingMessage]) -> Tuple[List[int], Dict[Tuple[int, int], int]]:
+    """
+    バッチを1トランザクションで保存し、確定したメッセージID（バッチと同じ順）と
+    (受信者ID, 会話ID) ごとの未読件数の増分を返す
+
+    保存済みの client_message_id（再送）は保存せず既存のIDを返す。
+    会話ごとに未読件数と updated_at もまとめて更新する
+    """
+    persisted = find_persisted_message_ids(
+        (pending.user_id, pending.client_message_id) for pending in batch if pending.client_message_id
+    )
+
+    results: List[Union[int, Message]] = []
+    messages: List[Message] = []
+    for pending in batch:
+        key = (pending.user_id, pending.client_message_id) if pending.client_message_id else None
+        if key in persisted:
+            results.append(persisted[key])
+            continue
+        message = Message(
+            conversation_id=pending.conversation_id,
+            user_id=pending.user_id,
+            content=pending.content,
+            client_message_id=pending.client_message_id,
+            created_at=pending.created_at
+        )
+        if key is not None:
+            # 同じバッチ内の再送も1件にまとめる
+            persisted[key] = message
+        messages.append(message)
+        results.append(message)
+    db.session.add_all(messages)
+
+    by_conversation: Dict[int, List[Message]] = {}
+    for message in messages:
+        by_conversation.setdefault(message.conversation_id, []).append(message)
+
+    unread_deltas: Dict[Tuple[int, int], int] = {}
+    if by_conversation:
+        conversations = Conversation.query.filter(Conversation.id.in_(by_conversation.keys())).all()
+        for conversation in conversations:
+            conversation_messages = by_conversation[conversation.id]
+            for recipient_id, count in record_new_messages(conversation, conversation_messages).items():
+                unread_deltas[(recipient_id, conversation.id)] = count
+            conversation.updated_at = max(message.created_at for message in conversation_messages)
+
+    db.session.commit()
+    return [result if isinstance(result, int) else result.id for result in results], unread_deltas
+
+class MessageWriter:
+    """保存待ちのメッセージを集め、グループコミットで保存するバックグラウンドタスク"""
+
+    def __init__(self, app, socketio: SocketIO, window_ms: float = 5, max_batch: int = 100,
+                 max_pending: int = 10000, max_attempts: int = 3):
+        self.app = app
+        self.socketio = socketio
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self._queue: 'queue.Queue[PendingMessage]' = queue.Queue(maxsize=max_pending)
+        # バックグラウンドタスクと終了時の書き出しが同時にコミットしないようにする
+        self._flush_lock = threading.Lock()
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self.socketio.start_background_task(self._run)
+        log_info("Message writer started", window_ms=self.window * 1000, max_batch=self.max_batch)
+
+    def stop(self) -> None:
+        self._running = False
+
+    def submit(self, pending: PendingMessage) -> bool:
+        """
+        保存待ちに追加。起動していない場合やキューが一杯の場合は False を返す
+        （呼び出し側はその場で保存する）
+        """
+        if not self._running:
+            return False
+        try:
+            self._queue.put_nowait(pending)
+            return True
+        except queue.Full:
+            log_warn("Message writer queue full", pending=self._queue.qsize())
+            return False
+
+    def _run(self) -> None:
+        while self._running:
+            try:
+                batch = self._collect()
+                if batch:
+                    self._flush(batch)
+            except Exception as e:
+                log_error("Message writer iteration failed", error=e)
+        self.drain()
+
+    def _collect(self) -> List[PendingMessage]:
+        """最初の1件を待ち、そこから時間枠が過ぎるか max_batch 件になるまで集める"""
+        try:
+            batch = [self._queue.get(timeout=1.0)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[PendingMessage]) -> None:
+        """バッチを保存して確認応答を送信。失敗した場合は間隔を空けて再試行する"""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with self._flush_lock, self.app.app_context():
+                    try:
+                        message_ids, unread_deltas = persist_messages(batch)
+                    except Exception:
+                        db.session.rollback()
+                        raise
+                break
+            except Exception as e:
+                log_error("Message group commit failed", error=e, attempt=attempt, batch_size=len(batch))
+                if attempt < self.max_attempts:
+                    self.socketio.sleep(0.05 * 2 ** attempt)
+        else:
+            if len(batch) > 1:
+                # 1件の不正なメッセージ（削除済みの会話など）でほかのメッセージまで失敗させない
+                for pending in batch:
+                    self._flush([pending])
+                return
+            for pending in batch:
+                self.socketio.emit('message_failed', {
+                    'provisional_id': pending.provisional_id,
+                    'client_message_id': pending.client_message_id,
+                    'conversation_id': pending.conversation_id
+                }, to=pending.sid)
+            return
+
+        for pending, message_id in zip(batch, message_ids):
+            self.socketio.emit('message_persisted', {
+                'provisional_id': pending.provisional_id,
+                'client_message_id': pending.client_message_id,
+                'conversation_id': pending.conversation_id,
+                'id': message_id
+            }, room=conversation_room(pending.conversation_id))
+        emit_unread_deltas(self.socketio, unread_deltas)
+
+    def drain(self) -> None:
+        """キューに残っているメッセージをすべて保存（停止時・プロセス終了時）"""
+        while True:
+            batch = []
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._flush(batch)
+
+    def shutdown(self) -> None:
+        """プロセス終了時にタスクを止め、確認応答前のメッセージをできるだけ保存する"""
+        self.stop()
+        try:
+            self.drain()
+        except Exception as e:
+            log_error("Message writer shutdown flush failed", error=e, pending=self._queue.qsize())
+
+_writer: Optional[MessageWriter] = None
+
+def start_message_writer(app, socketio: SocketIO) -> MessageWriter:
+    """ライターを起動（プロセスごとに1つ）"""
+    global _writer
+    if _writer is None:
+        _writer = MessageWriter(
+            app,
+            socketio,
+            window_ms=app.config.get('MESSAGE_GROUP_COMMIT_WINDOW_MS', 5),
+            max_batch=app.config.get('MESSAGE_GROUP_COMMIT_MAX_BATCH', 100)
+        )
+        _writer.start()
+        atexit.register(_writer.shutdown)
+    return _writer
+
+def get_message_writer() -> Optional[MessageWriter]:
+    """起動中のライターを返す（write-behind が無効なら None）"""
+    if _writer is not None and _writer.running:
+        return _writer
+    return None
@@ -0,0 +1,154 @@
+"""
+期限になったリマインダーを Socket.IO で通知するディスパッチャー
+
+アクティブなリマインダーごとに「次の発生日時」を1件だけ最小ヒープに持ち、
+期限になったものから順に reminder_due イベントを持ち主のユーザールームに送信する。
+データベースからは先読み期間（lookahead）ずつ追加で読み込むため、ポーリングは不要になる。
+
+scheduled_at は利用者の現地時刻（ReminderForm の datetime-local の値、タイムゾーンなし）で保存されているため、
+期限はサーバーのローカル時刻と比較する（サーバーのタイムゾーンを利用者に合わせておくこと）
+"""
+import heapq
+import itertools
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from flask_socketio import SocketIO
+from utils.logging import log_info, log_error
+from utils.recurrence import find_reminders_in_window, iter_occurrences, occurrence_to_dict
+
+# 発生日時の計算と通知に必要な項目だけを保持（ORM オブジェクトはセッション外で使えないため）
+ReminderSnapshot = namedtuple('ReminderSnapshot', [
+    'id', 'user_id', 'title', 'description', 'reminder_type',
+    'repeat_type', 'repeat_interval', 'scheduled_at', 'end_date', 'is_completed'
+])
+
+def user_room(user_id) -> str:
+    """ユーザーごとの Socket.IO ルーム名"""
+    return f'user_{user_id}'
+
+def local_now() -> datetime:
+    """scheduled_at と同じ基準（サーバーのローカル時刻、タイムゾーンなし）の現在時刻"""
+    return datetime.now()
+
+def _snapshot(reminder) -> ReminderSnapshot:
+    return ReminderSnapshot(*(getattr(reminder, field) for field in ReminderSnapshot._fields))
+
+class ReminderDispatcher:
+    """期限になったリマインダーを reminder_due イベントとして送信する"""
+
+    def __init__(self, app, socketio: SocketIO, lookahead: timedelta = timedelta(hours=1),
+                 tick_seconds: float = 1.0):
+        self.app = app
+        self.socketio = socketio
+        self.lookahead = lookahead
+        self.tick_seconds = tick_seconds
+        # (発生日時, トークン, リマインダーID)。トークンが古いエントリは無視する（遅延削除）
+        self._heap: List[Tuple[datetime, int, int]] = []
+        self._tracked: Dict[int, Tuple[int, ReminderSnapshot]] = {}
+        self._tokens = itertools.count()
+        self._lock = threading.Lock()
+        # この日時までの発生予定はヒープに読み込み済み
+        self._horizon: Optional[datetime] = None
+        self._running = False
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self.socketio.start_background_task(self._run)
+        log_info("Reminder dispatcher started", lookahead_seconds=self.lookahead.total_seconds())
+
+    def stop(self) -> None:
+        self._running = False
+
+    def _run(self) -> None:
+        while self._running:
+            try:
+                now = local_now()
+                if self._horizon is None or self._horizon - now < self.lookahead / 2:
+                    with self.app.app_context():
+                        self._extend_horizon(now)
+                self._dispatch_due(now)
+            except Exception as e:
+                log_error("Reminder dispatcher iteration failed", error=e)
+            self.socketio.sleep(self.tick_seconds)
+
+    def _push(self, snapshot: ReminderSnapshot, due_at: datetime) -> None:
+        token = next(self._tokens)
+        self._tracked[snapshot.id] = (token, snapshot)
+        heapq.heappush(self._heap, (due_at, token, snapshot.id))
+
+    def _schedule_next(self, snapshot: ReminderSnapshot, after: datetime) -> None:
+        """after より後（先読み範囲内）の次の発生日時を登録。なければ追跡をやめる"""
+        self._tracked.pop(snapshot.id, None)
+        if snapshot.is_completed or self._horizon is None:
+            return
+        for due_at in iter_occurrences(snapshot, after, self._horizon):
+            if due_at > after:
+                self._push(snapshot, due_at)
+                return
+
+    def _extend_horizon(self, now: datetime) -> None:
+        """先読み範囲を延ばし、その範囲で新たに発生するリマインダーを読み込む"""
+        window_start = self._horizon or now
+        window_end = now + self.lookahead
+        reminders = find_reminders_in_window(None, window_start, window_end, include_completed=False)
+
+        with self._lock:
+            self._horizon = window_end
+            for reminder in reminders:
+                if reminder.id in self._tracked:
+                    # 既に直近の発生日時を追跡中（通知後に次の発生日時を計算する）
+                    continue
+                snapshot = _snapshot(reminder)
+                for due_at in iter_occurrences(snapshot, window_start, window_end):
+                    self._push(snapshot, due_at)
+                    break
+
+    def _dispatch_due(self, now: datetime) -> None:
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due_at, token, reminder_id = heapq.heappop(self._heap)
+                tracked = self._tracked.get(reminder_id)
+                if tracked is None or tracked[0] != token:
+                    continue
+                snapshot = tracked[1]
+                due.append((snapshot, due_at))
+                self._schedule_next(snapshot, due_at)
+
+        for snapshot, due_at in due:
+            self.socketio.emit('reminder_due', occurrence_to_dict(snapshot, due_at), room=user_room(snapshot.user_id))
+            log_info("Reminder due", reminderId=snapshot.id, userId=snapshot.user_id, occurs_at=due_at.isoformat())
+
+    def refresh(self, reminder) -> None:
+        """リマインダーの作成・変更・完了時に次の発生日時を登録し直す"""
+        snapshot = _snapshot(reminder)
+        with self._lock:
+            self._schedule_next(snapshot, local_now())
+
+    def remove(self, reminder_id: int) -> None:
+        """削除されたリマインダーの追跡をやめる（ヒープ上のエントリは遅延削除）"""
+        with self._lock:
+            self._tracked.pop(reminder_id, None)
+
+_dispatcher: Optional[ReminderDispatcher] = None
+
+def start_reminder_dispatcher(app, socketio: SocketIO) -> ReminderDispatcher:
+    """ディスパッチャーを起動（プロセスごとに1つ）"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = ReminderDispatcher(app, socketio)
+        _dispatcher.start()
+    return _dispatcher
+
+def notify_reminder_changed(reminder) -> None:
+    """リマインダーの作成・変更・完了をディスパッチャーに反映（未起動なら何もしない）"""
+    if _dispatcher is not None:
+        _dispatcher.refresh(reminder)
+
+def notify_reminder_deleted(reminder_id: int) -> None:
+    if _dispatcher is not None:
+        _dispatcher.remove(reminder_id)
@@ -0,0 +1,87 @@
+"""
+サーキットブレーカー
+接続先の障害が続いた場合に一定時間呼び出しを止め、タイムアウト待ちを繰り返さずにすぐ失敗させる
+"""
+import threading
+import time
+from typing import Optional
+
+class CircuitOpenError(Exception):
+    """サーキットが開いている（呼び出しを止めている）ことを示す"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f'{name} circuit is open')
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    連続失敗が failure_threshold 回に達するとサーキットを開き、reset_timeout 秒間は呼び出しを拒否する。
+    reset_timeout 経過後は1件だけ試行を許可し（half-open）、成功すれば閉じ、失敗すれば再び開く
+
+    Example:
+        breaker = CircuitBreaker('frontend', failure_threshold=5, reset_timeout=10)
+        breaker.before_call()
+        try:
+            ...
+        except ConnectionError:
+            breaker.record_failure()
+            raise
+        except Exception:
+            breaker.release_trial()
+            raise
+        breaker.record_success()
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 10.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def before_call(self) -> None:
+        """呼び出し前に確認し、拒否する場合は CircuitOpenError を送出"""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return
+            elapsed = time.monotonic() - self._opened_at
+            raise CircuitOpenError(self.name, max(self.reset_timeout - elapsed, 1.0))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_progress or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_progress = False
+
+    def release_trial(self) -> None:
+        """
+        接続先の障害とは判定しない例外で呼び出しが終わった場合に、half-open の試行枠だけを戻す
+        （戻さないと試行中のままになり、サーキットが開いたままになる）
+        """
+        with self._lock:
+            self._trial_in_progress = False
@@ -0,0 +1,268 @@
+"""
+Next.js フロントエンドサーバーへのリバースプロキシ
+接続は keep-alive のセッションで使い回し、リクエスト・レスポンスの本文はチャンク単位で中継する。
+フロントエンドへの接続失敗が続いた場合はサーキットブレーカーですぐに失敗させる。
+内容が変わらない /_next/static/ のアセットはバイト数上限付きの LRU キャッシュから返す
+"""
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.cookiejar import DefaultCookiePolicy
+from typing import Hashable, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+import requests
+from requests.adapters import HTTPAdapter
+from flask import Response, request
+from .circuit_breaker import CircuitBreaker
+
+# 中継時に転送しないホップバイホップヘッダー
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade', 'host'
+}
+
+# 転送しないリクエストヘッダー（Content-Length は本文から requests が設定する）
+EXCLUDED_REQUEST_HEADERS = HOP_BY_HOP_HEADERS | {'content-length'}
+
+# 本文を中継するチャンクサイズ（バイト）
+CHUNK_SIZE = 64 * 1024
+
+CONNECT_TIMEOUT = float(os.environ.get('FRONTEND_PROXY_CONNECT_TIMEOUT', 3))
+READ_TIMEOUT = float(os.environ.get('FRONTEND_PROXY_READ_TIMEOUT', 30))
+POOL_SIZE = int(os.environ.get('FRONTEND_PROXY_POOL_SIZE', 20))
+
+frontend_breaker = CircuitBreaker(
+    'frontend',
+    failure_threshold=int(os.environ.get('FRONTEND_PROXY_FAILURE_THRESHOLD', 5)),
+    reset_timeout=float(os.environ.get('FRONTEND_PROXY_RESET_TIMEOUT', 10))
+)
+
+def _create_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # セッションは全ユーザーで共有するため、Cookie を保持しない（Cookie ヘッダーはそのまま転送する）
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    # リクエストごとに環境変数のプロキシ設定や .netrc を読みに行かない
+    session.trust_env = False
+    return session
+
+_session = _create_session()
+
+class _RequestBody:
+    """
+    長さが分かっているリクエスト本文をストリーミングで送るためのラッパー
+
+    requests は長さを取得できないストリームを Transfer-Encoding: chunked で送るため、
+    __len__ で長さを渡して Content-Length 付きで送らせる
+    """
+
+    def __init__(self, stream, length: int):
+        self._stream = stream
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        return self._stream.read(size)
+
+def _request_body():
+    """
+    転送する本文を返す
+
+    Content-Length が分かる場合はその長さで、chunked の場合は chunked のまま送る
+    （クライアントの Content-Length ヘッダーはコピーしないため、両方が付くことはない）
+    """
+    if request.content_length:
+        return _RequestBody(request.stream, request.content_length)
+    if 'chunked' in request.headers.get('Transfer-Encoding', '').lower():
+        return request.stream
+    return None
+
+def _stream_body(resp: requests.Response) -> Iterator[bytes]:
+    """フロントエンドのレスポンス本文をそのまま中継し、終わったら接続をプールに返す"""
+    try:
+        for chunk in resp.raw.stream(CHUNK_SIZE, decode_content=False):
+            yield chunk
+    finally:
+        resp.close()
+
+def _send(frontend_url: str, path: str, skip_headers: Iterable[str] = ()) -> requests.Response:
+    """現在のリクエストをフロントエンドに転送し、本文を読む前のレスポンスを返す"""
+    frontend_breaker.before_call()
+
+    url = urljoin(frontend_url, path)
+    # クエリパラメータも含める
+    if request.query_string:
+        url += '?' + request.query_string.decode('utf-8')
+
+    excluded = EXCLUDED_REQUEST_HEADERS | set(skip_headers)
+    headers = {key: value for (key, value) in request.headers if key.lower() not in excluded}
+
+    try:
+        resp = _session.request(
+            method=request.method,
+            url=url,
+            headers=headers,
+            data=_request_body(),
+            allow_redirects=False,
+            stream=True,
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+        )
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        frontend_breaker.record_failure()
+        raise
+    except BaseException:
+        # 接続先の障害ではない例外でも、half-open の試行中のまま残さない
+        frontend_breaker.release_trial()
+        raise
+    frontend_breaker.record_success()
+    return resp
+
+def _response_headers(resp: requests.Response) -> List[Tuple[str, str]]:
+    # 本文はデコードせずに中継するため、Content-Encoding / Content-Length はそのまま返す
+    return [(name, value) for (name, value) in resp.raw.headers.items() if name.lower() not in HOP_BY_HOP_HEADERS]
+
+def forward_request(frontend_url: str, path: str) -> Response:
+    """
+    現在のリクエストをフロントエンドに転送し、ストリーミングレスポンスを返す
+
+    Raises:
+        CircuitOpenError: フロントエンドへの接続失敗が続いている場合
+        requests.exceptions.RequestException: 接続失敗・タイムアウトなど
+    """
+    resp = _send(frontend_url, path)
+    return Response(_stream_body(resp), resp.status_code, _response_headers(resp), direct_passthrough=True)
+
+# ハッシュ付きで内容が変わらない Next.js の静的アセット
+CACHEABLE_ASSET_PREFIX = '_next/static/'
+
+ASSET_CACHE_MAX_BYTES = int(os.environ.get('FRONTEND_ASSET_CACHE_BYTES', 64 * 1024 * 1024))
+ASSET_CACHE_MAX_ENTRY_BYTES = int(os.environ.get('FRONTEND_ASSET_CACHE_MAX_ENTRY_BYTES', 8 * 1024 * 1024))
+
+class CachedAsset:
+    def __init__(self, status_code: int, headers: List[Tuple[str, str]], body: bytes, expires_at: float):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.expires_at = expires_at
+        self.etag = next((value for name, value in headers if name.lower() == 'etag'), None)
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """If-None-Match が ETag と一致するか（弱い比較）"""
+        if not if_none_match or not self.etag:
+            return False
+        etag = self.etag[2:] if self.etag.startswith('W/') else self.etag
+        for candidate in if_none_match.split(','):
+            candidate = candidate.strip()
+            if candidate == '*' or (candidate[2:] if candidate.startswith('W/') else candidate) == etag:
+                return True
+        return False
+
+    def to_response(self, cache_status: str = 'HIT') -> Response:
+        if self.matches(request.headers.get('If-None-Match')):
+            headers = [(name, value) for name, value in self.headers
+                       if name.lower() in ('etag', 'cache-control', 'vary', 'expires', 'last-modified')]
+            return Response(status=304, headers=headers)
+        return Response(self.body, self.status_code, self.headers + [('X-Cache', cache_status)], direct_passthrough=True)
+
+class AssetCache:
+    """本文の合計バイト数で上限を決める LRU キャッシュ（期限は Cache-Control の max-age）"""
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.size = 0
+        self._data: 'OrderedDict[Hashable, CachedAsset]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CachedAsset]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, entry: CachedAsset) -> None:
+        if len(entry.body) > self.max_entry_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = entry
+            self.size += len(entry.body)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    def _remove(self, key: Hashable) -> None:
+        self.size -= len(self._data.pop(key).body)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+asset_cache = AssetCache(ASSET_CACHE_MAX_BYTES, ASSET_CACHE_MAX_ENTRY_BYTES)
+
+def _cache_lifetime(resp: requests.Response) -> Optional[int]:
+    """レスポンスをキャッシュできる秒数（Cache-Control: public / max-age から判定、できなければ None）"""
+    if resp.status_code != 200:
+        return None
+    directives = {}
+    for directive in resp.headers.get('Cache-Control', '').lower().split(','):
+        name, _, value = directive.strip().partition('=')
+        directives[name] = value.strip('"')
+    if directives.keys() & {'no-store', 'no-cache', 'private'}:
+        return None
+    try:
+        max_age = int(directives.get('s-maxage') or directives.get('max-age') or 0)
+    except ValueError:
+        return None
+    vary = {value.strip().lower() for value in resp.headers.get('Vary', '').split(',') if value.strip()}
+    if max_age <= 0 or 'set-cookie' in resp.headers or vary - {'accept-encoding'}:
+        return None
+    return max_age
+
+def forward_cached_asset(frontend_url: str, path: str) -> Response:
+    """
+    Next.js の静的アセットをメモリキャッシュ経由で返す
+
+    キャッシュにあればフロントエンドに問い合わせずに返し、If-None-Match が一致すれば 304 を返す。
+    なければ条件付きヘッダーを外して本文ごと取得し、キャッシュできるものは保存する
+    """
+    if request.method != 'GET':
+        return forward_request(frontend_url, path)
+
+    # Vary: Accept-Encoding に備え、圧縮方式ごとに別のエントリにする
+    key = (path, request.query_string, request.headers.get('Accept-Encoding', ''))
+    entry = asset_cache.get(key)
+    if entry is not None:
+        return entry.to_response()
+
+    resp = _send(frontend_url, path, skip_headers=('if-none-match', 'if-modified-since'))
+    lifetime = _cache_lifetime(resp)
+    if lifetime is None:
+        return Response(_stream_body(resp), resp.status_code, _response_headers(resp), direct_passthrough=True)
+
+    chunks = []
+    size = 0
+    body = _stream_body(resp)
+    for chunk in body:
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > asset_cache.max_entry_bytes:
+            # 大きすぎるアセットはキャッシュせず、読み込み済みの分から続けて中継する
+            return Response(itertools.chain(chunks, body), resp.status_code, _response_headers(resp),
+                            direct_passthrough=True)
+
+    entry = CachedAsset(resp.status_code, _response_headers(resp), b''.join(chunks), time.monotonic() + lifetime)
+    asset_cache.set(key, entry)
+    return entry.to_response('MISS')
@@ -0,0 +1,153 @@
+"""
+健康データの最新値と目標の達成状況
+最新値は latest_health_values に保持し、健康データの書き込みと同じトランザクションで更新する
+"""
+from datetime import timedelta
+from typing import Dict, Iterable, Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import HealthData, HealthGoal, LatestHealthValue
+from .recurrence import to_naive_utc
+
+# 集計に使える時間バケット
+AGGREGATE_BUCKETS = ('hour', 'day', 'week', 'month')
+
+def bucket_expression(bucket: str, tz_offset_minutes: int = 0):
+    """
+    recorded_at をバケットの開始日時に丸める SQL 式
+
+    tz_offset_minutes を指定すると、UTC からずらした現地時刻で丸める（例: 日本時間は 540）
+    """
+    if db.engine.dialect.name == 'sqlite':
+        # SQLite には date_trunc がないため strftime で代用（週は月曜始まり）
+        modifiers = [f'{tz_offset_minutes:+d} minutes'] if tz_offset_minutes else []
+        formats = {
+            'hour': ('%Y-%m-%d %H:00:00',),
+            'day': ('%Y-%m-%d 00:00:00',),
+            'week': ('%Y-%m-%d 00:00:00', 'weekday 0', '-6 days'),
+            'month': ('%Y-%m-01 00:00:00',),
+        }
+        fmt, *extra = formats[bucket]
+        return func.strftime(fmt, HealthData.recorded_at, *modifiers, *extra)
+
+    recorded_at = HealthData.recorded_at
+    if tz_offset_minutes:
+        recorded_at = recorded_at + timedelta(minutes=tz_offset_minutes)
+    return func.date_trunc(bucket, recorded_at)
+
+def get_latest_health_values(user_id: int, data_types: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """
+    データタイプごとの最新の値を latest_health_values から取得（主キー検索のみ）
+
+    Returns:
+        {data_type: value}
+    """
+    query = db.session.query(LatestHealthValue.data_type, LatestHealthValue.value).filter(
+        LatestHealthValue.user_id == user_id
+    )
+
+    if data_types is not None:
+        data_types = list(data_types)
+        if not data_types:
+            return {}
+        query = query.filter(LatestHealthValue.data_type.in_(data_types))
+
+    return {row.data_type: row.value for row in query.all()}
+
+def _set_latest_value(latest: LatestHealthValue, health_data: HealthData) -> None:
+    latest.health_data_id = health_data.id
+    latest.value = health_data.value
+    latest.unit = health_data.unit
+    latest.recorded_at = health_data.recorded_at
+
+def record_latest_value(health_data: HealthData) -> None:
+    """新しい健康データが最新であれば最新値テーブルに反映（コミットは呼び出し側で行う）"""
+    # DBの保存形式（UTC の naive datetime）に揃えてから比較する
+    health_data.recorded_at = to_naive_utc(health_data.recorded_at)
+    # IDを確定させる
+    db.session.flush()
+
+    key = (health_data.user_id, health_data.data_type)
+    latest = db.session.get(LatestHealthValue, key)
+    if latest is None:
+        latest = LatestHealthValue(user_id=health_data.user_id, data_type=health_data.data_type)
+        _set_latest_value(latest, health_data)
+        try:
+            # 同じデータタイプの最初の登録が同時に行われた場合に備え、セーブポイント内で追加する
+            with db.session.begin_nested():
+                db.session.add(latest)
+        except IntegrityError:
+            # ほかのリクエストが先に作成した行を読み直して比較する
+            latest = db.session.get(LatestHealthValue, key, populate_existing=True)
+        else:
+            return
+
+    if (health_data.recorded_at, health_data.id) < (latest.recorded_at, latest.health_data_id):
+        return
+
+    _set_latest_value(latest, health_data)
+
+def refresh_latest_values(user_id: int, data_types: Iterable[str]) -> None:
+    """
+    指定データタイプの最新値を履歴から再計算（更新・削除・一括登録の後に使用）
+
+    (user_id, data_type, recorded_at) のインデックスで1件だけ読むため、履歴の件数に依存しない
+    """
+    for data_type in set(data_types):
+        health_data = HealthData.query.filter_by(
+            user_id=user_id,
+            data_type=data_type
+        ).order_by(HealthData.recorded_at.desc(), HealthData.id.desc()).first()
+
+        latest = db.session.get(LatestHealthValue, (user_id, data_type))
+        if health_data is None:
+            if latest is not None:
+                db.session.delete(latest)
+            continue
+
+        if latest is None:
+            latest = LatestHealthValue(user_id=user_id, data_type=data_type)
+            db.session.add(latest)
+        _set_latest_value(latest, health_data)
+
+def is_goal_achieved(target_value: float, current_value: Optional[float]) -> bool:
+    """目標値が正なら以上、負なら絶対値以下で達成"""
+    if current_value is None:
+        return False
+    return current_value >= target_value if target_value > 0 else current_value <= abs(target_value)
+
+def get_goal_progress(goal: HealthGoal, latest_values: Dict[str, float]) -> dict:
+    """最新値を反映した目標の dict を返す（データベースには書き込まない）"""
+    goal_dict = goal.to_dict()
+    if goal.data_type in latest_values:
+        current_value = latest_values[goal.data_type]
+        goal_dict['current_value'] = current_value
+        goal_dict['is_achieved'] = is_goal_achieved(goal.target_value, current_value)
+    return goal_dict
+
+def apply_goal_progress(goal: HealthGoal, current_value: Optional[float]) -> bool:
+    """値が変わった場合のみ current_value / is_achieved を更新し、更新したかを返す"""
+    is_achieved = is_goal_achieved(goal.target_value, current_value)
+    if goal.current_value == current_value and goal.is_achieved == is_achieved:
+        return False
+    goal.current_value = current_value
+    goal.is_achieved = is_achieved
+    return True
+
+def refresh_goal_progress(user_id: int, data_types: Iterable[str]) -> None:
+    """
+    健康データの書き込み後、該当する目標の進捗を更新（コミットは呼び出し側で行う）
+
+    目標がないデータタイプでは最新値の問い合わせも行わない
+    """
+    goals = HealthGoal.query.filter(
+        HealthGoal.user_id == user_id,
+        HealthGoal.data_type.in_(set(data_types))
+    ).all()
+    if not goals:
+        return
+
+    latest_values = get_latest_health_values(user_id, {goal.data_type for goal in goals})
+    for goal in goals:
+        apply_goal_progress(goal, latest_values.get(goal.data_type))
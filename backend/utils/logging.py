@@ -1,11 +1,234 @@
 """
 構造化ログユーティリティ
 Railwayのログエクスプローラーで検索・フィルタリングしやすくするため、JSON形式でログを出力
+
+ログは上限付きのキューに積むだけで呼び出し元に戻り、バックグラウンドのライタースレッドが
+まとめて JSON に変換して書き出す。キューがあふれた場合は破棄し、破棄件数を定期的に報告する。
+
+環境変数:
+    LOG_LEVEL: 出力する最低レベル（debug, info, warn, error、デフォルト: info）
+    LOG_ASYNC: false でキューを使わず同期的に出力
+    LOG_QUEUE_SIZE: キューの上限件数（デフォルト: 10000）
+    LOG_SAMPLE_RATES: メッセージごとの出力割合（例: "Reminders retrieved=0.1;Conversations retrieved=0.5"）
+    LOG_RATE_LIMITS: メッセージごとの1秒あたりの上限件数（例: "Get reminders request=5"）
 """
+import atexit
 import json
+import os
+import random
 import sys
+import time
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    # monkey patch 後もネイティブスレッドで書き出す（標準出力への書き込みでハブを止めない）
+    from eventlet import patcher as _patcher
+    _threading = _patcher.original('threading')
+    _queue = _patcher.original('queue')
+except ImportError:
+    import threading as _threading
+    import queue as _queue
+
+LEVELS = {'debug': 10, 'info': 20, 'warn': 30, 'error': 40}
+
+# ライターが一度に書き出す最大件数と、書き出しの間隔（秒）
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 0.5
+
+# 破棄件数を報告する間隔（秒）
+DROP_REPORT_INTERVAL = 10.0
+
+# 1リクエストで何度も出力されるメッセージの、1秒あたりの上限件数
+DEFAULT_RATE_LIMITS = {
+    'Get reminders request': 10,
+    'Reminders retrieved': 10,
+    'Conversations retrieved': 10,
+}
+
+def _parse_message_settings(value: Optional[str]) -> Dict[str, float]:
+    """"メッセージ=数値;メッセージ=数値" 形式の環境変数を読み込む"""
+    settings = {}
+    for item in (value or '').split(';'):
+        message, sep, number = item.rpartition('=')
+        if sep and message.strip():
+            try:
+                settings[message.strip()] = float(number)
+            except ValueError:
+                continue
+    return settings
+
+class _LogPipeline:
+    """ログレコードのフィルタ（レベル・サンプリング・レート制限）とバックグラウンド書き出し"""
+
+    def __init__(self):
+        self.level = LEVELS.get(os.getenv('LOG_LEVEL', 'info').lower(), LEVELS['info'])
+        self.async_enabled = os.getenv('LOG_ASYNC', 'true').lower() in ('true', '1', 'yes')
+        self.sample_rates: Dict[str, float] = _parse_message_settings(os.getenv('LOG_SAMPLE_RATES'))
+        self.rate_limits: Dict[str, float] = {
+            **DEFAULT_RATE_LIMITS,
+            **_parse_message_settings(os.getenv('LOG_RATE_LIMITS'))
+        }
+        self._queue = _queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000)))
+        # メッセージごとの (1秒間の開始時刻, 件数)
+        self._rate_windows: Dict[str, Tuple[float, int]] = {}
+        self._lock = _threading.Lock()
+        self._writer: Optional[Any] = None
+        self._stopping = False
+        self.dropped = 0
+        self.rate_limited = 0
+        self.sampled_out = 0
+        self._unreported_drops = 0
+        self._last_drop_report = time.monotonic()
+
+    def _allow(self, level: int, message: str) -> bool:
+        if level < self.level:
+            return False
+        # 警告・エラーは間引かない
+        if level >= LEVELS['warn']:
+            return True
+
+        sample_rate = self.sample_rates.get(message)
+        if sample_rate is not None and random.random() >= sample_rate:
+            self.sampled_out += 1
+            return False
+
+        limit = self.rate_limits.get(message)
+        if limit is not None:
+            now = time.monotonic()
+            with self._lock:
+                window_start, count = self._rate_windows.get(message, (now, 0))
+                if now - window_start >= 1.0:
+                    window_start, count = now, 0
+                if count >= limit:
+                    self.rate_limited += 1
+                    return False
+                self._rate_windows[message] = (window_start, count + 1)
+        return True
+
+    def submit(self, level_name: str, message: str, fields: Dict[str, Any]) -> None:
+        level = LEVELS.get(level_name, LEVELS['info'])
+        if not self._allow(level, message):
+            return
+
+        record = (level_name, message, datetime.utcnow().isoformat(), fields)
+        if not self.async_enabled:
+            self._write([record])
+            return
+
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(record)
+        except _queue.Full:
+            with self._lock:
+                self.dropped += 1
+                self._unreported_drops += 1
+            if level >= LEVELS['error']:
+                # エラーは破棄せず同期的に書き出す
+                self._write([record])
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = _threading.Thread(target=self._run, name='log-writer', daemon=True)
+                self._writer.start()
+
+    def _run(self) -> None:
+        while not self._stopping:
+            batch = self._take_batch(timeout=FLUSH_INTERVAL)
+            if batch:
+                self._write(batch)
+            self._report_drops()
+
+    def _take_batch(self, timeout: Optional[float]) -> List[tuple]:
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait())
+            while len(batch) < BATCH_SIZE:
+                batch.append(self._queue.get_nowait())
+        except _queue.Empty:
+            pass
+        return batch
+
+    def _report_drops(self) -> None:
+        now = time.monotonic()
+        if now - self._last_drop_report < DROP_REPORT_INTERVAL:
+            return
+        with self._lock:
+            dropped, self._unreported_drops = self._unreported_drops, 0
+            self._last_drop_report = now
+        if dropped:
+            self._write([('warn', 'Log records dropped', datetime.utcnow().isoformat(),
+                          {'dropped': dropped, 'dropped_total': self.dropped})])
+
+    def _write(self, records: List[tuple]) -> None:
+        """レコードを JSON 1行ずつに変換し、出力先ごとにまとめて書き出す"""
+        lines = {sys.stdout: [], sys.stderr: []}
+        for level_name, message, timestamp, fields in records:
+            log_data: Dict[str, Any] = {
+                "level": level_name,
+                "message": message,
+                "timestamp": timestamp,
+                **fields
+            }
+            # JSON形式で1行に出力（Railwayのログパーサーが正しく解析できるように）
+            line = json.dumps(log_data, ensure_ascii=False, default=str)
+            lines[sys.stderr if level_name == 'error' else sys.stdout].append(line)
+
+        for stream, stream_lines in lines.items():
+            if stream_lines:
+                try:
+                    stream.write('\n'.join(stream_lines) + '\n')
+                    stream.flush()
+                except Exception:
+                    pass
+
+    def close(self) -> None:
+        """
+        ライタースレッドを止め、キューに残っているレコードをすべて書き出す（終了時用）
+
+        ライターが書き出し中のバッチを失わないよう、スレッドの終了を待ってから残りを書き出す。
+        以降のログは同期的に出力する
+        """
+        self.async_enabled = False
+        self._stopping = True
+        writer = self._writer
+        if writer is not None and writer is not _threading.current_thread():
+            writer.join(timeout=FLUSH_INTERVAL * 4)
+        self.flush()
+
+    def flush(self) -> None:
+        """キューに残っているレコードをすべて書き出す"""
+        while True:
+            batch = self._take_batch(timeout=None)
+            if not batch:
+                break
+            self._write(batch)
+        self._last_drop_report = 0
+        self._report_drops()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'queued': self._queue.qsize(),
+            'dropped': self.dropped,
+            'rate_limited': self.rate_limited,
+            'sampled_out': self.sampled_out,
+        }
+
+_pipeline = _LogPipeline()
+
+def get_log_stats() -> Dict[str, int]:
+    """キューに残っている件数と、破棄・間引いた件数を返す"""
+    return _pipeline.stats()
+
+def flush_logs() -> None:
+    """プロセス終了時に、キューに残っているログをすべて書き出す"""
+    _pipeline.close()
+
+# 先に登録した関数ほど後に呼ばれるため、ほかの終了処理が出力したログもここで書き出される
+atexit.register(flush_logs)
 
 def log_structured(
     level: str,
@@ -13,26 +236,18 @@ def log_structured(
     **kwargs: Any
 ) -> None:
     """
-    構造化ログを出力
-    
+    構造化ログを出力（キューに積むだけで、書き出しはバックグラウンドで行う）
+
     Args:
         level: ログレベル (debug, info, warn, error)
         message: ログメッセージ
         **kwargs: 追加の属性（カスタム属性として検索可能）
-    
+
     Example:
         log_structured("info", "User logged in", userId=123, email="user@example.com")
         log_structured("error", "Database connection failed", error=str(e), retry_count=3)
     """
-    log_data: Dict[str, Any] = {
-        "level": level.lower(),
-        "message": message,
-        "timestamp": datetime.utcnow().isoformat(),
-        **kwargs
-    }
-    
-    # JSON形式で1行に出力（Railwayのログパーサーが正しく解析できるように）
-    print(json.dumps(log_data, ensure_ascii=False), file=sys.stdout if level != "error" else sys.stderr)
+    _pipeline.submit(level.lower(), message, kwargs)
 
 def log_info(message: str, **kwargs: Any) -> None:
     """情報ログ"""
@@ -49,7 +264,7 @@ def log_error(message: str, error: Optional[Exception] = None, **kwargs: Any) ->
         # スタックトレースがある場合は含める
         import traceback
         error_data["traceback"] = traceback.format_exc()
-    
+
     log_structured("error", message, **{**error_data, **kwargs})
 
 def log_warn(message: str, **kwargs: Any) -> None:
@@ -59,4 +274,3 @@ def log_warn(message: str, **kwargs: Any) -> None:
 def log_debug(message: str, **kwargs: Any) -> None:
     """デバッグログ"""
     log_structured("debug", message, **kwargs)
-
@@ -0,0 +1,80 @@
+"""
+会話の参加者かどうか（メンバーシップ）の確認
+(user_id, conversation_id) ごとの結果をプロセス内にキャッシュし、
+Socket.IO のセッションごとに確認済みの会話を覚えて、送信のたびに確認しないようにする
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import or_
+from extensions import db
+from models import Conversation
+from .cache import TTLCache
+
+# 会話の参加者は作成後に変わらないため長めにキャッシュする。参加者が決まる・変わる箇所（会話の作成）では
+# invalidate_membership で明示的に破棄し、他プロセスのキャッシュにはこの秒数で反映される
+MEMBERSHIP_TTL = 300
+
+_membership_cache = TTLCache(maxsize=10000, ttl=MEMBERSHIP_TTL)
+
+# sid -> (ユーザーID, 確認済みの会話ID)
+_session_conversations: Dict[str, Tuple[int, Set[int]]] = {}
+_session_lock = threading.Lock()
+
+def check_membership(user_id: int, conversation_id: int) -> Optional[bool]:
+    """ユーザーが会話の参加者か確認（会話が存在しない場合は None。存在しない結果はキャッシュしない）"""
+    key = (user_id, conversation_id)
+    is_member = _membership_cache.get(key)
+    if is_member is None:
+        participants = db.session.query(Conversation.patient_id, Conversation.provider_id).filter(
+            Conversation.id == conversation_id
+        ).first()
+        if participants is None:
+            return None
+        is_member = user_id in participants
+        _membership_cache.set(key, is_member)
+    return is_member
+
+def remember_conversations(conversations: Iterable[Conversation]) -> None:
+    """読み込み済みの会話（patient_id / provider_id を持つ行）の参加者をキャッシュに登録"""
+    for conversation in conversations:
+        _membership_cache.set((conversation.patient_id, conversation.id), True)
+        _membership_cache.set((conversation.provider_id, conversation.id), True)
+
+def load_user_conversation_ids(user_id: int) -> List[int]:
+    """ユーザーが参加しているすべての会話IDを1回のクエリで取得し、メンバーシップのキャッシュも温める"""
+    conversations = db.session.query(Conversation.id, Conversation.patient_id, Conversation.provider_id).filter(
+        or_(Conversation.patient_id == user_id, Conversation.provider_id == user_id)
+    ).all()
+    remember_conversations(conversations)
+    return [conversation.id for conversation in conversations]
+
+def invalidate_membership(conversation_id: int, user_id: Optional[int] = None) -> None:
+    """
+    会話のメンバーシップのキャッシュを破棄（user_id を省略した場合は会話の全参加者分）
+
+    確認済みとして覚えているセッションからも取り除く
+    """
+    if user_id is None:
+        _membership_cache.pop_matching(lambda key: key[1] == conversation_id)
+    else:
+        _membership_cache.pop((user_id, conversation_id))
+
+    with _session_lock:
+        for session_user_id, conversation_ids in _session_conversations.values():
+            if user_id is None or session_user_id == user_id:
+                conversation_ids.discard(conversation_id)
+
+def authorize_session(sid: str, user_id: int, *conversation_ids: int) -> None:
+    """セッションが会話に参加できることを確認済みとして覚える"""
+    with _session_lock:
+        _, authorized = _session_conversations.setdefault(sid, (user_id, set()))
+        authorized.update(conversation_ids)
+
+def is_session_authorized(sid: str, conversation_id: int) -> bool:
+    entry = _session_conversations.get(sid)
+    return entry is not None and conversation_id in entry[1]
+
+def forget_session(sid: str) -> None:
+    """切断時にセッションの確認済み情報を破棄"""
+    with _session_lock:
+        _session_conversations.pop(sid, None)
@@ -0,0 +1,108 @@
+"""
+Socket.IO のセッション・在席情報のレジストリ
+
+複数のワーカー・ノードで動かす場合は Redis を使う共有レジストリ、
+1プロセスで動かす場合や動作確認ではプロセス内のレジストリ（ローカルの代替実装）を使う
+"""
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Set
+from flask import current_app
+
+# 切断されずに残ったセッション（プロセスの異常終了など）を Redis から消すまでの秒数
+SESSION_TTL = 24 * 60 * 60
+
+class LocalPresenceRegistry:
+    """プロセス内のレジストリ（1プロセス構成・動作確認用）"""
+
+    def __init__(self):
+        self._users_by_sid: Dict[str, int] = {}
+        self._sids_by_user: Dict[int, Set[str]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def add_session(self, sid: str, user_id: int) -> None:
+        with self._lock:
+            self._users_by_sid[sid] = user_id
+            self._sids_by_user[user_id].add(sid)
+
+    def remove_session(self, sid: str) -> Optional[int]:
+        with self._lock:
+            user_id = self._users_by_sid.pop(sid, None)
+            if user_id is not None:
+                sids = self._sids_by_user.get(user_id)
+                if sids is not None:
+                    sids.discard(sid)
+                    if not sids:
+                        del self._sids_by_user[user_id]
+            return user_id
+
+    def get_user_id(self, sid: str) -> Optional[int]:
+        return self._users_by_sid.get(sid)
+
+    def get_sessions(self, user_id: int) -> Set[str]:
+        with self._lock:
+            return set(self._sids_by_user.get(user_id, ()))
+
+    def is_online(self, user_id: int) -> bool:
+        return bool(self._sids_by_user.get(user_id))
+
+class RedisPresenceRegistry:
+    """Redis を使う共有レジストリ（すべてのワーカー・ノードから同じ在席情報が見える）"""
+
+    def __init__(self, url: str, prefix: str = 'poke_sup:presence'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('The redis package is required for a redis:// presence registry')
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._prefix = prefix
+
+    def _sid_key(self, sid: str) -> str:
+        return f'{self._prefix}:sid:{sid}'
+
+    def _user_key(self, user_id: int) -> str:
+        return f'{self._prefix}:user:{user_id}'
+
+    def add_session(self, sid: str, user_id: int) -> None:
+        pipe = self._redis.pipeline()
+        pipe.set(self._sid_key(sid), user_id, ex=SESSION_TTL)
+        pipe.sadd(self._user_key(user_id), sid)
+        pipe.expire(self._user_key(user_id), SESSION_TTL)
+        pipe.execute()
+
+    def remove_session(self, sid: str) -> Optional[int]:
+        user_id = self.get_user_id(sid)
+        pipe = self._redis.pipeline()
+        pipe.delete(self._sid_key(sid))
+        if user_id is not None:
+            pipe.srem(self._user_key(user_id), sid)
+        pipe.execute()
+        return user_id
+
+    def get_user_id(self, sid: str) -> Optional[int]:
+        value = self._redis.get(self._sid_key(sid))
+        return int(value) if value is not None else None
+
+    def get_sessions(self, user_id: int) -> Set[str]:
+        return set(self._redis.smembers(self._user_key(user_id)))
+
+    def is_online(self, user_id: int) -> bool:
+        return self._redis.scard(self._user_key(user_id)) > 0
+
+def create_presence_registry(url: Optional[str]):
+    """URL が redis:// / rediss:// なら共有レジストリ、それ以外はプロセス内のレジストリを作成"""
+    if url and url.startswith(('redis://', 'rediss://')):
+        return RedisPresenceRegistry(url)
+    return LocalPresenceRegistry()
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_presence_registry():
+    """設定（PRESENCE_REGISTRY_URL）に応じたレジストリを返す（プロセスごとに1つ）"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = create_presence_registry(current_app.config.get('PRESENCE_REGISTRY_URL'))
+    return _registry
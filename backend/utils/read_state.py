@@ -0,0 +1,151 @@
+"""
+会話の既読状態管理
+参加者ごとの既読位置（last_read_message_id）と未読件数を、メッセージの作成・削除・既読化と
+同じトランザクション内で更新する
+"""
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import func, inspect
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import Conversation, ConversationReadState, Message
+
+def _count_unread(conversation_id: int, user_id: int, after_message_id: Optional[int] = None) -> int:
+    """messages.is_read から未読件数を数える（既読状態の初期化・再計算用）"""
+    query = db.session.query(func.count(Message.id)).filter(
+        Message.conversation_id == conversation_id,
+        Message.user_id != user_id,
+        Message.is_read == False
+    )
+    if after_message_id:
+        query = query.filter(Message.id > after_message_id)
+    return query.scalar() or 0
+
+def _decrement_unread(state: ConversationReadState) -> None:
+    """未読件数を1減らす（永続化済みの行は同時更新に備えて SQL 式で更新）"""
+    if state.unread_count <= 0:
+        return
+    if inspect(state).persistent:
+        state.unread_count = ConversationReadState.unread_count - 1
+    else:
+        state.unread_count -= 1
+
+def get_recipient_id(conversation: Conversation, sender_id: int) -> int:
+    """送信者から見た相手の参加者IDを返す"""
+    return conversation.provider_id if sender_id == conversation.patient_id else conversation.patient_id
+
+def _get_or_create_read_state(conversation_id: int, user_id: int) -> Tuple[ConversationReadState, bool]:
+    """既読状態を取得し、なければ作成する（作成したかどうかも返す）"""
+    key = (conversation_id, user_id)
+    state = db.session.get(ConversationReadState, key)
+    if state is not None:
+        return state, False
+
+    state = ConversationReadState(
+        conversation_id=conversation_id,
+        user_id=user_id,
+        unread_count=_count_unread(conversation_id, user_id)
+    )
+    try:
+        # 同じ会話・参加者の初期化が同時に行われた場合に備え、セーブポイント内で追加する
+        with db.session.begin_nested():
+            db.session.add(state)
+    except IntegrityError:
+        # ほかのリクエストが先に作成した行を使う
+        return db.session.get(ConversationReadState, key, populate_existing=True), False
+    return state, True
+
+def get_read_state(conversation_id: int, user_id: int) -> ConversationReadState:
+    """
+    既読状態を取得
+
+    まだ行が存在しない会話（既読状態テーブル導入前の会話など）は、
+    既存メッセージの is_read から未読件数を計算して作成する
+    """
+    return _get_or_create_read_state(conversation_id, user_id)[0]
+
+def get_unread_counts(conversation_ids: Iterable[int], user_id: int) -> Dict[int, int]:
+    """複数会話の未読件数をまとめて取得（既読状態がない会話は is_read から集計）"""
+    conversation_ids = list(conversation_ids)
+    if not conversation_ids:
+        return {}
+
+    counts = dict(
+        db.session.query(ConversationReadState.conversation_id, ConversationReadState.unread_count).filter(
+            ConversationReadState.user_id == user_id,
+            ConversationReadState.conversation_id.in_(conversation_ids)
+        ).all()
+    )
+
+    missing = [conversation_id for conversation_id in conversation_ids if conversation_id not in counts]
+    if missing:
+        counts.update(
+            db.session.query(Message.conversation_id, func.count(Message.id)).filter(
+                Message.conversation_id.in_(missing),
+                Message.user_id != user_id,
+                Message.is_read == False
+            ).group_by(Message.conversation_id).all()
+        )
+
+    return counts
+
+def record_new_message(conversation: Conversation, message: Message) -> None:
+    """新しいメッセージを相手の未読件数に加算（コミットは呼び出し側で行う）"""
+    record_new_messages(conversation, [message])
+
+def record_new_messages(conversation: Conversation, messages: Iterable[Message]) -> Dict[int, int]:
+    """
+    同じ会話の複数の新しいメッセージを、送信者ごとに相手の未読件数へまとめて加算
+
+    Returns:
+        受信者IDごとの未読件数の増分
+    """
+    # メッセージIDを確定させ、初期化時の集計に新しいメッセージが含まれるようにする
+    db.session.flush()
+
+    counts: Dict[int, int] = {}
+    for message in messages:
+        recipient_id = get_recipient_id(conversation, message.user_id)
+        counts[recipient_id] = counts.get(recipient_id, 0) + 1
+
+    for recipient_id, count in counts.items():
+        state, created = _get_or_create_read_state(conversation.id, recipient_id)
+        # 作成した場合は初期化時の集計に今回のメッセージも含まれる
+        if not created:
+            state.unread_count = ConversationReadState.unread_count + count
+    return counts
+
+def record_deleted_message(conversation: Conversation, message: Message) -> None:
+    """未読のまま削除されたメッセージを相手の未読件数から差し引く"""
+    if message.is_read:
+        return
+
+    recipient_id = get_recipient_id(conversation, message.user_id)
+    state = db.session.get(ConversationReadState, (conversation.id, recipient_id))
+    if state is not None:
+        _decrement_unread(state)
+
+def record_message_read(message: Message, user_id: int) -> None:
+    """1件のメッセージが既読になったことを未読件数に反映"""
+    if message.is_read or message.user_id == user_id:
+        return
+
+    _decrement_unread(get_read_state(message.conversation_id, user_id))
+
+def mark_read_up_to(conversation_id: int, user_id: int, message_id: int) -> ConversationReadState:
+    """
+    指定メッセージまでの相手のメッセージを1回の UPDATE でまとめて既読にする
+
+    既読位置は戻らないため、message_id がこの会話のメッセージであることは呼び出し側で確認すること
+    """
+    db.session.query(Message).filter(
+        Message.conversation_id == conversation_id,
+        Message.user_id != user_id,
+        Message.id <= message_id,
+        Message.is_read == False
+    ).update({Message.is_read: True}, synchronize_session=False)
+
+    state = get_read_state(conversation_id, user_id)
+    last_read_message_id = max(state.last_read_message_id or 0, message_id)
+    state.last_read_message_id = last_read_message_id
+    state.unread_count = _count_unread(conversation_id, user_id, after_message_id=last_read_message_id)
+    return state
@@ -0,0 +1,131 @@
+"""
+リマインダーの繰り返し展開
+repeat_type / repeat_interval / end_date から、指定期間内の発生日時を遅延生成する
+"""
+import calendar
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional
+from sqlalchemy import and_, or_
+from models import Reminder
+from .cache import TTLCache
+
+REPEAT_TYPES = ('daily', 'weekly', 'monthly')
+
+# 1回の展開で返す発生回数の上限
+MAX_OCCURRENCES = 5000
+
+# ユーザーごとの展開結果のキャッシュ（リマインダー変更時に無効化）
+_occurrence_cache = TTLCache(maxsize=1024, ttl=300)
+
+def to_naive_utc(value: datetime) -> datetime:
+    """タイムゾーン付きの日時を UTC の naive datetime に揃える（DBの保存形式に合わせる）"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _add_months(value: datetime, months: int, day: int) -> datetime:
+    """月を加算（月末を超える日は、その月の末日に丸める）"""
+    month_index = value.month - 1 + months
+    year = value.year + month_index // 12
+    month = month_index % 12 + 1
+    return value.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
+
+def iter_occurrences(reminder: Reminder, window_start: datetime, window_end: datetime) -> Iterator[datetime]:
+    """
+    [window_start, window_end) に含まれる発生日時を古い順に生成
+
+    期間の開始位置までは計算で読み飛ばすため、開始日が古いリマインダーでも
+    期間外の発生日時を1つずつ辿ることはない
+    """
+    start = to_naive_utc(reminder.scheduled_at)
+    last = to_naive_utc(reminder.end_date) if reminder.end_date else None
+    if last is not None and last < window_end:
+        # end_date（ReminderForm の datetime-local の日時）ちょうどの発生回までを含める
+        window_end = min(window_end, last + timedelta(microseconds=1))
+
+    if reminder.repeat_type not in REPEAT_TYPES:
+        if window_start <= start < window_end:
+            yield start
+        return
+
+    interval = max(reminder.repeat_interval or 1, 1)
+
+    if reminder.repeat_type == 'monthly':
+        # 期間の開始月の少し前から辿る
+        months_ahead = (window_start.year - start.year) * 12 + (window_start.month - start.month) - 1
+        index = max(months_ahead // interval, 0)
+        while True:
+            occurrence = _add_months(start, index * interval, start.day)
+            if occurrence >= window_end:
+                return
+            if occurrence >= window_start:
+                yield occurrence
+            index += 1
+
+    step = timedelta(days=interval if reminder.repeat_type == 'daily' else interval * 7)
+    index = 0
+    if window_start > start:
+        # 期間の開始以降で最初の発生回まで読み飛ばす
+        index = -((start - window_start) // step)
+    occurrence = start + step * index
+    while occurrence < window_end:
+        yield occurrence
+        occurrence += step
+
+def occurrence_to_dict(reminder: Reminder, occurs_at: datetime) -> dict:
+    return {
+        'reminder_id': reminder.id,
+        'title': reminder.title,
+        'description': reminder.description,
+        'reminder_type': reminder.reminder_type,
+        'repeat_type': reminder.repeat_type,
+        'is_completed': reminder.is_completed,
+        'occurs_at': occurs_at.isoformat()
+    }
+
+def find_reminders_in_window(user_id: Optional[int], window_start: datetime, window_end: datetime,
+                             include_completed: bool = True) -> List[Reminder]:
+    """期間内に発生する可能性のあるリマインダーだけを取得（user_id が None の場合は全ユーザー）"""
+    is_repeating = Reminder.repeat_type.in_(REPEAT_TYPES)
+    query = Reminder.query.filter(
+        Reminder.scheduled_at < window_end,
+        or_(
+            and_(is_repeating, or_(Reminder.end_date.is_(None), Reminder.end_date >= window_start)),
+            and_(~is_repeating | Reminder.repeat_type.is_(None), Reminder.scheduled_at >= window_start)
+        )
+    )
+    if user_id is not None:
+        query = query.filter(Reminder.user_id == user_id)
+    if not include_completed:
+        query = query.filter(Reminder.is_completed == False)
+    return query.order_by(Reminder.scheduled_at).all()
+
+def expand_occurrences(reminders: List[Reminder], window_start: datetime, window_end: datetime,
+                       limit: int = MAX_OCCURRENCES) -> List[dict]:
+    """リマインダー群を展開し、発生日時順に並べて返す"""
+    occurrences = []
+    for reminder in reminders:
+        for occurs_at in iter_occurrences(reminder, window_start, window_end):
+            occurrences.append((occurs_at, reminder.id, reminder))
+            if len(occurrences) >= limit * 2:
+                # 上限を大きく超える前に早めに切り詰める
+                occurrences.sort(key=lambda item: item[:2])
+                del occurrences[limit:]
+                break
+
+    occurrences.sort(key=lambda item: item[:2])
+    return [occurrence_to_dict(reminder, occurs_at) for occurs_at, _, reminder in occurrences[:limit]]
+
+def get_occurrences(user_id: int, window_start: datetime, window_end: datetime) -> List[dict]:
+    """期間内の発生予定を取得（ユーザーごとにキャッシュ）"""
+    key = (user_id, window_start, window_end)
+    occurrences = _occurrence_cache.get(key)
+    if occurrences is None:
+        reminders = find_reminders_in_window(user_id, window_start, window_end)
+        occurrences = expand_occurrences(reminders, window_start, window_end)
+        _occurrence_cache.set(key, occurrences)
+    return occurrences
+
+def invalidate_occurrences(user_id: Optional[int]) -> None:
+    """リマインダーの作成・変更・削除時に、そのユーザーの展開結果を破棄"""
+    _occurrence_cache.pop_matching(lambda key: key[0] == user_id)
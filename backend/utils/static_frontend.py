@@ -0,0 +1,76 @@
+"""
+静的エクスポートした Next.js フロントエンドの配信
+ビルド済みディレクトリのファイルをディスクから直接返す（send_file は wsgi.file_wrapper を使うため、
+対応するサーバーでは sendfile で送信される）。事前圧縮した .br / .gz があればそれを返し、
+Range リクエストと ETag による条件付きリクエストにも対応する
+"""
+import mimetypes
+import os
+from typing import Optional, Tuple
+from flask import Response, request, send_file
+from werkzeug.security import safe_join
+
+# ファイル名にハッシュが付き、内容が変わらないアセット
+IMMUTABLE_PREFIX = '_next/static/'
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# 事前圧縮ファイルの拡張子（優先順）
+PRECOMPRESSED_VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+
+def _resolve_file(static_dir: str, path: str) -> Optional[str]:
+    """
+    リクエストパスに対応するファイルを探す
+
+    trailingSlash の静的エクスポートでは /dashboard/ が dashboard/index.html になるため、
+    path / path.html / path/index.html の順に探す
+    """
+    path = path.strip('/')
+    candidates = [path, f'{path}.html', f'{path}/index.html'] if path else ['index.html']
+    for candidate in candidates:
+        file_path = safe_join(static_dir, candidate)
+        if file_path and os.path.isfile(file_path):
+            return file_path
+    return None
+
+def _select_variant(file_path: str) -> Tuple[str, Optional[str]]:
+    """クライアントが受け付ける事前圧縮ファイルがあれば、そのパスと Content-Encoding を返す"""
+    for encoding, suffix in PRECOMPRESSED_VARIANTS:
+        if request.accept_encodings[encoding] and os.path.isfile(file_path + suffix):
+            return file_path + suffix, encoding
+    return file_path, None
+
+def serve_frontend_file(static_dir: str, path: str) -> Optional[Response]:
+    """
+    静的ディレクトリからファイルを返す
+
+    見つからないページはクライアント側のルーティングに任せるため index.html を返す。
+    拡張子付きのパス（アセット）が見つからない場合と、index.html もない場合は None を返す
+    """
+    file_path = _resolve_file(static_dir, path)
+    if file_path is None:
+        if os.path.splitext(path)[1]:
+            return None
+        file_path = _resolve_file(static_dir, '')
+        if file_path is None:
+            return None
+
+    mimetype = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+    variant_path, encoding = _select_variant(file_path)
+
+    response = send_file(variant_path, mimetype=mimetype, conditional=True, etag=True, max_age=0)
+
+    if path.startswith(IMMUTABLE_PREFIX):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+        response.expires = None
+    else:
+        # HTML などは毎回 ETag で再検証させる
+        response.cache_control.no_cache = True
+
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if any(os.path.isfile(file_path + suffix) for _, suffix in PRECOMPRESSED_VARIANTS):
+        response.vary.add('Accept-Encoding')
+    return response
@@ -9,48 +9,49 @@ import { format, startOfMonth, endOfMonth, eachDayOfInterval, isSameDay } from '
 import { ja } from 'date-fns/locale'
 import { ChevronLeft, ChevronRight, Calendar as CalendarIcon } from 'lucide-react'
 
-interface Reminder {
-  id: number
+interface ReminderOccurrence {
+  reminder_id: number
   title: string
-  scheduled_at: string
+  occurs_at: string
   reminder_type?: string
 }
 
-interface HealthData {
-  id: number
+interface HealthDataSummary {
   data_type: string
-  recorded_at: string
+  count: number
+  min: number
+  max: number
+  avg: number
+}
+
+interface CalendarDay {
+  date: string
+  reminders: ReminderOccurrence[]
+  health_data: HealthDataSummary[]
 }
 
 export default function CalendarPage() {
   const router = useRouter()
   const { isAuthenticated } = useAuthStore()
   const [currentDate, setCurrentDate] = useState(new Date())
-  const [reminders, setReminders] = useState<Reminder[]>([])
-  const [healthData, setHealthData] = useState<HealthData[]>([])
+  const [calendarDays, setCalendarDays] = useState<Record<string, CalendarDay>>({})
 
   const fetchData = useCallback(async () => {
     try {
-      const startDate = startOfMonth(currentDate)
-      const endDate = endOfMonth(currentDate)
-
-      const [remindersRes, healthDataRes] = await Promise.all([
-        api.get('/reminders', {
-          params: {
-            start_date: startDate.toISOString(),
-            end_date: endDate.toISOString(),
-          },
-        }),
-        api.get('/health-data', {
-          params: {
-            start_date: startDate.toISOString(),
-            end_date: endDate.toISOString(),
-          },
-        }),
-      ])
-
-      setReminders(remindersRes.data || [])
-      setHealthData(healthDataRes.data || [])
+      // 日ごとの集計はサーバー側で行い、1回のリクエストで取得する
+      const response = await api.get('/calendar/month', {
+        params: {
+          year: currentDate.getFullYear(),
+          month: currentDate.getMonth() + 1,
+          tz_offset: -currentDate.getTimezoneOffset(),
+        },
+      })
+
+      const daysByDate: Record<string, CalendarDay> = {}
+      for (const day of response.data.days || []) {
+        daysByDate[day.date] = day
+      }
+      setCalendarDays(daysByDate)
     } catch (error) {
       console.error('Failed to fetch data:', error)
     }
@@ -69,13 +70,11 @@ export default function CalendarPage() {
   const days = eachDayOfInterval({ start: monthStart, end: monthEnd })
 
   const getDayEvents = (day: Date) => {
-    const dayReminders = reminders.filter((r) =>
-      isSameDay(new Date(r.scheduled_at), day)
-    )
-    const dayHealthData = healthData.filter((d) =>
-      isSameDay(new Date(d.recorded_at), day)
-    )
-    return { reminders: dayReminders, healthData: dayHealthData }
+    const calendarDay = calendarDays[format(day, 'yyyy-MM-dd')]
+    return {
+      reminders: calendarDay?.reminders || [],
+      healthData: calendarDay?.health_data || [],
+    }
   }
 
   const previousMonth = () => {
@@ -154,7 +153,7 @@ export default function CalendarPage() {
                   <div className="space-y-1">
                     {dayReminders.slice(0, 2).map((reminder) => (
                       <div
-                        key={reminder.id}
+                        key={`${reminder.reminder_id}-${reminder.occurs_at}`}
                         className="text-xs bg-blue-100 text-blue-800 px-2 py-1 rounded truncate"
                         title={reminder.title}
                       >
@@ -162,8 +161,13 @@ export default function CalendarPage() {
                       </div>
                     ))}
                     {dayHealthData.length > 0 && (
-                      <div className="text-xs bg-green-100 text-green-800 px-2 py-1 rounded">
-                        📊 {dayHealthData.length}件のデータ
+                      <div
+                        className="text-xs bg-green-100 text-green-800 px-2 py-1 rounded"
+                        title={dayHealthData
+                          .map((summary) => `${summary.data_type}: ${summary.count}件`)
+                          .join('\n')}
+                      >
+                        📊 {dayHealthData.reduce((total, summary) => total + summary.count, 0)}件のデータ
                       </div>
                     )}
                   </div>
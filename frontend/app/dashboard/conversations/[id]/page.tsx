@@ -5,7 +5,7 @@ import { useRouter, useParams } from 'next/navigation'
 import { useAuthStore } from '@/store/authStore'
 import DashboardLayout from '@/components/dashboard/DashboardLayout'
 import api from '@/lib/api'
-import { getSocket } from '@/lib/socket'
+import { getSocket, sendChatMessage } from '@/lib/socket'
 import { Send, ArrowLeft } from 'lucide-react'
 import MessageItem from '@/components/conversations/MessageItem'
 import MessageSearch from '@/components/conversations/MessageSearch'
@@ -13,6 +13,9 @@ import { NotificationService } from '@/lib/notifications'
 
 interface Message {
   id: number
+  // write-behind モードで保存前に配信されたメッセージの仮ID（保存されると id が設定される）
+  provisional_id?: string
+  conversation_id?: number
   user_id: number
   content: string
   created_at: string
@@ -29,7 +32,10 @@ export default function ConversationPage() {
   const [displayedMessages, setDisplayedMessages] = useState<Message[]>([])
   const [newMessage, setNewMessage] = useState('')
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState<number | null>(null)
+  const [loadingOlder, setLoadingOlder] = useState(false)
   const messagesEndRef = useRef<HTMLDivElement>(null)
+  const skipScrollRef = useRef(false)
   const socket = getSocket()
 
   useEffect(() => {
@@ -40,8 +46,15 @@ export default function ConversationPage() {
 
     socket.emit('join_conversation', { conversation_id: conversationId })
 
-    socket.on('new_message', async (message: Message) => {
+    const handleNewMessage = async (message: Message) => {
+      // 接続時に参加中のすべての会話を購読しているため、ほかの会話のメッセージは無視する
+      if (message.conversation_id !== conversationId) return
+
       setMessages((prev) => {
+        // 再送されたメッセージは同じ仮IDで届くため、重複して表示しない
+        if (message.provisional_id && prev.some((msg) => msg.provisional_id === message.provisional_id)) {
+          return prev
+        }
         const updated = [...prev, message]
         setDisplayedMessages(updated)
         return updated
@@ -55,14 +68,31 @@ export default function ConversationPage() {
         )
       }
       
-      // Mark as read if current user is viewing
-      if (message.user_id !== user?.id) {
+      // Mark as read if current user is viewing（仮IDのメッセージは保存後に既読にする）
+      if (message.user_id !== user?.id && message.id) {
         markMessageAsRead(message.id)
       }
-    })
+    }
+
+    // write-behind モードでメッセージが保存されたら仮IDを確定したIDに置き換える
+    // （相手のメッセージは messages の更新後にまとめて既読にする）
+    const handleMessagePersisted = (ack: { provisional_id: string; id: number }) => {
+      setMessages((prev) => {
+        const updated = prev.map((msg) =>
+          msg.provisional_id === ack.provisional_id ? { ...msg, id: ack.id } : msg
+        )
+        setDisplayedMessages(updated)
+        return updated
+      })
+    }
+
+    socket.on('new_message', handleNewMessage)
+    socket.on('message_persisted', handleMessagePersisted)
 
     return () => {
-      socket.emit('leave_conversation', { conversation_id: conversationId })
+      // 共有のソケットのため、ほかのコンポーネントのリスナーは残す
+      socket.off('new_message', handleNewMessage)
+      socket.off('message_persisted', handleMessagePersisted)
     }
   }, [conversationId, socket, user])
 
@@ -71,14 +101,20 @@ export default function ConversationPage() {
   }, [messages, user])
 
   useEffect(() => {
+    // 過去のメッセージを読み込んだ場合はスクロール位置を維持
+    if (skipScrollRef.current) {
+      skipScrollRef.current = false
+      return
+    }
     scrollToBottom()
   }, [messages])
 
   const fetchMessages = async () => {
     try {
       const response = await api.get(`/messages/conversation/${conversationId}`)
-      setMessages(response.data)
-      setDisplayedMessages(response.data)
+      setMessages(response.data.messages)
+      setDisplayedMessages(response.data.messages)
+      setNextCursor(response.data.next_cursor)
     } catch (error) {
       console.error('Failed to fetch messages:', error)
     } finally {
@@ -86,6 +122,34 @@ export default function ConversationPage() {
     }
   }
 
+  const fetchOlderMessages = async () => {
+    if (!nextCursor || loadingOlder) return
+
+    setLoadingOlder(true)
+    try {
+      const response = await api.get(`/messages/conversation/${conversationId}`, {
+        params: { before: nextCursor },
+      })
+      skipScrollRef.current = true
+      setMessages((prev) => {
+        const updated = [...response.data.messages, ...prev]
+        setDisplayedMessages(updated)
+        return updated
+      })
+      setNextCursor(response.data.next_cursor)
+    } catch (error) {
+      console.error('Failed to fetch older messages:', error)
+    } finally {
+      setLoadingOlder(false)
+    }
+  }
+
+  const handleMessagesScroll = (e: React.UIEvent<HTMLDivElement>) => {
+    if (e.currentTarget.scrollTop === 0) {
+      fetchOlderMessages()
+    }
+  }
+
   const handleMessageSearch = (filteredMessages: Message[]) => {
     setDisplayedMessages(filteredMessages)
   }
@@ -95,10 +159,8 @@ export default function ConversationPage() {
     if (!newMessage.trim() || !socket) return
 
     try {
-      socket.emit('send_message', {
-        conversation_id: conversationId,
-        content: newMessage,
-      })
+      // 保存の確認応答を受け取るまで lib/socket が再送する
+      sendChatMessage(conversationId, newMessage)
       setNewMessage('')
     } catch (error) {
       console.error('Failed to send message:', error)
@@ -111,7 +173,7 @@ export default function ConversationPage() {
 
   const markMessageAsRead = async (messageId: number) => {
     try {
-      await api.put(`/messages/${messageId}/read`)
+      await api.put(`/messages/conversation/${conversationId}/read`, { message_id: messageId })
     } catch (error) {
       console.error('Failed to mark message as read:', error)
     }
@@ -121,16 +183,23 @@ export default function ConversationPage() {
     if (!user) return
     
     const unreadMessages = messages.filter(
-      (msg) => msg.user_id !== user.id && !msg.is_read
+      (msg) => msg.user_id !== user.id && !msg.is_read && msg.id
     )
+    if (unreadMessages.length === 0) return
     
-    for (const message of unreadMessages) {
-      await markMessageAsRead(message.id)
-    }
-    
-    // Refresh messages to update read status
-    if (unreadMessages.length > 0) {
-      fetchMessages()
+    // 最後の未読メッセージまでを1回のリクエストでまとめて既読にする
+    const lastUnread = unreadMessages[unreadMessages.length - 1]
+    try {
+      await api.put(`/messages/conversation/${conversationId}/read`, {
+        message_id: lastUnread.id,
+      })
+      const updated = messages.map((msg) =>
+        msg.user_id !== user.id && msg.id <= lastUnread.id ? { ...msg, is_read: true } : msg
+      )
+      setMessages(updated)
+      setDisplayedMessages(updated)
+    } catch (error) {
+      console.error('Failed to mark messages as read:', error)
     }
   }
 
@@ -159,7 +228,10 @@ export default function ConversationPage() {
           <MessageSearch messages={messages} onSearch={handleMessageSearch} />
         </div>
 
-        <div className="flex-1 overflow-y-auto p-4 space-y-4">
+        <div className="flex-1 overflow-y-auto p-4 space-y-4" onScroll={handleMessagesScroll}>
+          {loadingOlder && (
+            <div className="text-center text-sm text-gray-500">Loading...</div>
+          )}
           {displayedMessages.length === 0 && messages.length > 0 ? (
             <div className="text-center py-8 text-gray-500">
               <p>検索結果が見つかりません</p>
@@ -167,7 +239,7 @@ export default function ConversationPage() {
           ) : (
             displayedMessages.map((message) => (
               <MessageItem
-                key={message.id}
+                key={message.id || message.provisional_id}
                 message={message}
                 onUpdate={fetchMessages}
               />
@@ -24,19 +24,17 @@ export default function DashboardPage() {
 
   const fetchStats = async () => {
     try {
-      const [conversationsRes, healthDataRes, remindersRes] = await Promise.all([
-        api.get('/conversations'),
-        api.get('/health-data'),
-        api.get('/reminders?upcoming_only=true&is_completed=false'),
-      ])
+      // 件数はサーバー側で集計したサマリーから取得する（今後の予定はブラウザの現地時刻で数える）
+      const response = await api.get('/dashboard/summary', {
+        params: { tz_offset: -new Date().getTimezoneOffset() },
+      })
+      const summary = response.data
 
       setStats({
-        conversations: conversationsRes.data.length,
-        healthData: healthDataRes.data.length,
-        reminders: remindersRes.data.length,
-        upcomingReminders: remindersRes.data.filter(
-          (r: any) => new Date(r.scheduled_at) >= new Date()
-        ).length,
+        conversations: summary.conversations.count,
+        healthData: summary.health_data.count,
+        reminders: summary.reminders.pending_count,
+        upcomingReminders: summary.reminders.upcoming_count,
       })
     } catch (error: any) {
       console.error('Failed to fetch stats:', error)
@@ -3,6 +3,7 @@
 import { useEffect, useState } from 'react'
 import { useRouter } from 'next/navigation'
 import api from '@/lib/api'
+import { getSocket } from '@/lib/socket'
 import { MessageSquare, Plus } from 'lucide-react'
 import CreateConversationModal from './CreateConversationModal'
 import SearchBar from '../common/SearchBar'
@@ -69,6 +70,25 @@ export default function ConversationsList() {
     checkAndFetch()
   }, [])
 
+  useEffect(() => {
+    // 新しいメッセージの未読件数の増分をサーバーから受け取り、一覧を再取得せずにバッジを更新する
+    const socket = getSocket()
+    if (!socket) return
+
+    const handleUnreadDelta = ({ conversation_id, delta }: { conversation_id: number; delta: number }) => {
+      setConversations((prev) =>
+        prev.map((conv) =>
+          conv.id === conversation_id ? { ...conv, unread_count: (conv.unread_count || 0) + delta } : conv
+        )
+      )
+    }
+
+    socket.on('unread_delta', handleUnreadDelta)
+    return () => {
+      socket.off('unread_delta', handleUnreadDelta)
+    }
+  }, [])
+
   useEffect(() => {
     if (searchQuery.trim() === '') {
       setFilteredConversations(conversations)
@@ -4,6 +4,14 @@ import { useEffect } from 'react'
 import api from '@/lib/api'
 import { NotificationService } from '@/lib/notifications'
 import { useAuthStore } from '@/store/authStore'
+import { getSocket } from '@/lib/socket'
+
+interface ReminderOccurrence {
+  reminder_id: number
+  title: string
+  description?: string
+  occurs_at: string
+}
 
 interface Reminder {
   id: number
@@ -22,6 +30,23 @@ export default function ReminderNotification() {
     // Request notification permission on mount
     NotificationService.requestPermission()
 
+    // 同じ発生日時の通知は1回だけ表示する（サーバーからの通知とポーリングの両方で届くため）
+    const notified = new Set<string>()
+    const notifyOnce = async (reminderId: number, occursAt: string, title: string, description?: string) => {
+      const key = `${reminderId}:${new Date(occursAt).getTime()}`
+      if (notified.has(key)) return
+      notified.add(key)
+      await NotificationService.showReminder(title, description || 'リマインダーの時間です')
+    }
+
+    // Socket.IO が使える場合はサーバーからの reminder_due イベントでも通知する。
+    // ディスパッチャーが無効・別プロセスの場合もあるため、下のポーリングは止めない
+    const socket = getSocket()
+    const handleReminderDue = async (occurrence: ReminderOccurrence) => {
+      await notifyOnce(occurrence.reminder_id, occurrence.occurs_at, occurrence.title, occurrence.description)
+    }
+    socket?.on('reminder_due', handleReminderDue)
+
     // Check for upcoming reminders every minute
     const checkReminders = async () => {
       try {
@@ -69,10 +94,7 @@ export default function ReminderNotification() {
             scheduledAt > now &&
             !reminder.is_completed
           ) {
-            await NotificationService.showReminder(
-              reminder.title,
-              reminder.description || 'リマインダーの時間です'
-            )
+            await notifyOnce(reminder.id, reminder.scheduled_at, reminder.title, reminder.description)
           }
         }
       } catch (error: any) {
@@ -115,6 +137,7 @@ export default function ReminderNotification() {
     return () => {
       clearTimeout(initialDelay)
       clearInterval(interval)
+      socket?.off('reminder_due', handleReminderDue)
     }
   }, [user])
 
@@ -1,7 +1,69 @@
 import { io, Socket } from 'socket.io-client'
+import { toast } from '@/components/common/Toast'
 
 let socket: Socket | null = null
 
+// 確認応答がない場合に再送するまでの時間と最大送信回数
+const RESEND_TIMEOUT_MS = 10000
+const MAX_SEND_ATTEMPTS = 5
+
+interface PendingSend {
+  conversationId: number
+  content: string
+  attempts: number
+  timer?: ReturnType<typeof setTimeout>
+}
+
+// 保存の確認応答（ack の id または message_persisted）を待っているメッセージ
+const pendingSends = new Map<string, PendingSend>()
+
+const generateClientMessageId = (): string =>
+  typeof crypto !== 'undefined' && 'randomUUID' in crypto
+    ? crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+
+const settle = (clientMessageId: string) => {
+  const pending = pendingSends.get(clientMessageId)
+  if (!pending) return
+  clearTimeout(pending.timer)
+  pendingSends.delete(clientMessageId)
+}
+
+const emitPending = (clientMessageId: string) => {
+  const pending = pendingSends.get(clientMessageId)
+  if (!pending || !socket) return
+
+  if (pending.attempts >= MAX_SEND_ATTEMPTS) {
+    settle(clientMessageId)
+    toast.error('メッセージを送信できませんでした')
+    return
+  }
+
+  pending.attempts += 1
+  clearTimeout(pending.timer)
+  // 確認応答がなければ同じ client_message_id で再送する（サーバー側で重複は保存されない）
+  pending.timer = setTimeout(() => emitPending(clientMessageId), RESEND_TIMEOUT_MS)
+
+  socket.emit(
+    'send_message',
+    { conversation_id: pending.conversationId, content: pending.content, client_message_id: clientMessageId },
+    (ack?: { id?: number; provisional_id?: string }) => {
+      // 通常モードでは ack の id が保存済みを表す（write-behind モードでは message_persisted を待つ）
+      if (ack?.id) settle(clientMessageId)
+    }
+  )
+}
+
+/**
+ * チャットメッセージを送信し、保存が確認できるまで再送する
+ */
+export const sendChatMessage = (conversationId: number, content: string): string => {
+  const clientMessageId = generateClientMessageId()
+  pendingSends.set(clientMessageId, { conversationId, content, attempts: 0 })
+  emitPending(clientMessageId)
+  return clientMessageId
+}
+
 export const getSocket = (): Socket | null => {
   if (!socket) {
     const token = localStorage.getItem('access_token')
@@ -20,6 +82,16 @@ export const getSocket = (): Socket | null => {
 
     socket.on('connect', () => {
       console.log('Socket connected')
+      // 再接続時は確認応答を受け取っていないメッセージを再送する
+      pendingSends.forEach((_, clientMessageId) => emitPending(clientMessageId))
+    })
+
+    socket.on('message_persisted', (ack: { client_message_id?: string }) => {
+      if (ack.client_message_id) settle(ack.client_message_id)
+    })
+
+    socket.on('message_failed', (failure: { client_message_id?: string }) => {
+      if (failure.client_message_id) emitPending(failure.client_message_id)
     })
 
     socket.on('disconnect', () => {